@@ -1,4 +1,4 @@
-__version__ = "4.0.18"
+__version__ = "4.1.0"
 
 __authors__ = [
     "Juan Miguel Taboada Godoy <juanmi@juanmitaboada.com>",
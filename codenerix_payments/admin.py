@@ -23,6 +23,8 @@ from codenerix_payments.models import (  # type: ignore
     Currency,
     PaymentAnswer,
     PaymentConfirmation,
+    PaymentCounter,
+    PaymentNotification,
     PaymentRequest,
 )
 
@@ -30,3 +32,5 @@ admin.site.register(Currency)
 admin.site.register(PaymentRequest)
 admin.site.register(PaymentConfirmation)
 admin.site.register(PaymentAnswer)
+admin.site.register(PaymentNotification)
+admin.site.register(PaymentCounter)
@@ -0,0 +1,283 @@
+#
+# django-codenerix-payments
+#
+# Codenerix GNU
+#
+# Project URL : http://www.codenerix.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# type: ignore
+
+import json
+import logging
+import threading
+import time
+
+import paypalrestsdk  # pylint: disable=import-error
+import requests
+import yop_python_sdk.utils.yop_logger as yop_logger
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from yop_python_sdk.client.yop_client_config import YopClientConfig
+from yop_python_sdk.client.yopclient import YopClient
+
+from codenerix_payments.gateway import GATEWAY_TIMEOUT, gateway_timeout
+
+# Requests to PayPal are logged where paypalrestsdk.Api logs them
+paypal_logger = logging.getLogger("paypalrestsdk.api")
+
+
+def yeepay_config(config):
+    """
+    Translate a Yeepay platform from settings.PAYMENTS to the structure
+    expected by the Yeepay SDK
+    """
+
+    # Timeouts (milliseconds) from the platform's "timeout" unless given
+    http_client = dict(config.get("http_client", {}))
+    timeout = config.get("timeout", GATEWAY_TIMEOUT)
+    http_client.setdefault("connect_timeout", min(timeout, 10) * 1000)
+    http_client.setdefault("read_timeout", timeout * 1000)
+
+    return {
+        "app_key": config.get("app_key", None),
+        "server_root": config.get("endpoint", None),
+        "yop_public_key": [{"value": config.get("public_key", None)}],
+        "http_client": http_client,
+        "isv_private_key": [{"value": config.get("private_key", None)}],
+    }
+
+
+class YeepayClientConfig(YopClientConfig):
+    """
+    YopClientConfig built from a dictionary instead of a JSON file
+    """
+
+    def __init__(self, sdk_config):
+        self.logger = yop_logger.get_logger()
+        self.config_file = None
+        self.sdk_config = self._init_config(sdk_config)
+
+    def _init_config(self, sdk_config):
+        # Work on a copy, the SDK replaces the keys with parsed objects
+        sdk_config = json.loads(json.dumps(sdk_config))
+        app_key = sdk_config.get("app_key", "")
+
+        # Platform public key
+        yop_public_key_dict = {}
+        for yop_public_key_str in sdk_config["yop_public_key"]:
+            yop_public_key, cert_type, serial_no = self._parse_yop_public_key(
+                yop_public_key_str,
+            )
+            yop_public_key_dict.setdefault(cert_type, {})[
+                serial_no
+            ] = yop_public_key
+        sdk_config["yop_public_key"] = yop_public_key_dict
+
+        # ISV private key (only one is supported)
+        for isv_private_key in sdk_config["isv_private_key"]:
+            credentials = self._parse_isv_private_key(app_key, isv_private_key)
+            if credentials is not None:
+                sdk_config["credentials"] = {credentials.appKey: credentials}
+                break
+
+        # HTTP client
+        http_client = sdk_config["http_client"]
+        (
+            http_client["connect_timeout"],
+            http_client["read_timeout"],
+            http_client["max_conn_total"],
+            http_client["max_conn_per_route"],
+        ) = self._parse_http_client(http_client)
+
+        return sdk_config
+
+
+class YeepayClient(YopClient):
+    """
+    YopClient that keeps its HTTP connections alive between calls
+    """
+
+    def __init__(self, clientConfig=None, cert_type=None, env=None):
+        super().__init__(clientConfig, cert_type, env)
+
+        # Pooled HTTP session
+        http_client = self.clientConfig.get_http_client()
+        adapter = HTTPAdapter(
+            pool_maxsize=int(http_client["max_conn_per_route"]),
+        )
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _timeout(self, http_client):
+        return (
+            round(http_client["connect_timeout"] / 1000, 3),
+            round(http_client["read_timeout"] / 1000, 3),
+        )
+
+    def _get_request(self, url, query_params={}, headers={}, http_client={}):
+        return self.session.get(
+            url=url,
+            params=query_params,
+            headers=headers,
+            timeout=self._timeout(http_client),
+        )
+
+    def _post_request(
+        self,
+        url,
+        payload=None,
+        params=None,
+        headers={},
+        http_client={},
+    ):
+        return self.session.post(
+            url=url,
+            headers=headers,
+            data=payload,
+            params=params,
+            timeout=self._timeout(http_client),
+        )
+
+
+_yeepay_clients = {}
+_yeepay_clients_lock = threading.Lock()
+
+
+def yeepay_platform_client(platform):
+    """
+    Return the YeepayClient for the platform in settings.PAYMENTS, it is
+    built once per process and rebuilt if the platform's configuration
+    changes
+    """
+
+    # Get the configuration for this platform
+    sdk_config = yeepay_config(settings.PAYMENTS.get(platform, {}))
+    fingerprint = json.dumps(sdk_config, sort_keys=True)
+
+    # Look for a client built with the same configuration
+    with _yeepay_clients_lock:
+        cached = _yeepay_clients.get(platform, None)
+        if cached is None or cached[0] != fingerprint:
+            cached = (
+                fingerprint,
+                YeepayClient(YeepayClientConfig(sdk_config)),
+            )
+            _yeepay_clients[platform] = cached
+
+    # Return the client
+    return cached[1]
+
+
+class PaypalApi(paypalrestsdk.Api):
+    """
+    paypalrestsdk.Api that keeps its HTTP connections alive between calls
+    and gives up on requests taking longer than timeout seconds
+    """
+
+    def __init__(self, options=None, timeout=GATEWAY_TIMEOUT, **kwargs):
+        super().__init__(options, **kwargs)
+        self.session = requests.Session()
+        self.timeout = timeout
+
+    def http_call(self, url, method, **kwargs):
+        # Log the request (headers and body only outside live mode, as
+        # paypalrestsdk.Api.http_call does)
+        live = self.mode.lower() == "live"
+        paypal_logger.info("Request[%s]: %s", method, url)
+        if live:
+            paypal_logger.info(
+                "Not logging full request/response headers and body in "
+                "live mode for compliance",
+            )
+        else:
+            paypal_logger.debug("Level: %s", self.mode)
+            paypal_logger.debug(
+                "Request: \nHeaders: %s\nBody: %s",
+                kwargs.get("headers", {}),
+                kwargs.get("data", {}),
+            )
+
+        # Send it
+        kwargs.setdefault("timeout", self.timeout)
+        start = time.perf_counter()
+        response = self.session.request(
+            method,
+            url,
+            proxies=self.proxies,
+            **kwargs,
+        )
+
+        # Log the response
+        paypal_logger.info(
+            "Response[%d]: %s, Duration: %.6fs.",
+            response.status_code,
+            response.reason,
+            time.perf_counter() - start,
+        )
+        debug_id = response.headers.get("PayPal-Debug-Id")
+        if debug_id:
+            paypal_logger.debug("debug_id: %s", debug_id)
+        if not live:
+            paypal_logger.debug(
+                "Headers: %s\nBody: %s",
+                response.headers,
+                response.content,
+            )
+
+        return self.handle_response(
+            response,
+            response.content.decode("utf-8"),
+        )
+
+
+_paypal_apis = {}
+_paypal_apis_lock = threading.Lock()
+
+
+def paypal_api(platform, real):
+    """
+    Return the PaypalApi for the platform in settings.PAYMENTS and the
+    environment, it is built once per process (so the OAuth token is
+    reused) and rebuilt if the platform's credentials or timeout change
+    """
+
+    # Select environment
+    if real:
+        environment = "live"
+    else:
+        environment = "sandbox"
+
+    # Get the credentials for this platform
+    config = settings.PAYMENTS.get(platform, {})
+    credentials = (config.get("id", None), config.get("secret", None))
+    timeout = gateway_timeout(platform)
+
+    # Look for an API built with the same credentials
+    with _paypal_apis_lock:
+        cached = _paypal_apis.get((platform, environment), None)
+        if cached is None or cached[0] != (credentials, timeout):
+            cached = (
+                (credentials, timeout),
+                PaypalApi(
+                    mode=environment,
+                    client_id=credentials[0],
+                    client_secret=credentials[1],
+                    timeout=timeout,
+                ),
+            )
+            _paypal_apis[(platform, environment)] = cached
+
+    # Return the API
+    return cached[1]
@@ -0,0 +1,295 @@
+#
+# django-codenerix-payments
+#
+# Codenerix GNU
+#
+# Project URL : http://www.codenerix.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# type: ignore
+
+import abc
+import logging
+import threading
+import time
+
+import requests
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Seconds a currency is remembered by this process and by Django's cache
+CURRENCY_LOCAL_TTL = getattr(
+    settings,
+    "CDNX_PAYMENTS_CURRENCY_LOCAL_TTL",
+    60,
+)
+CURRENCY_CACHE_TTL = getattr(
+    settings,
+    "CDNX_PAYMENTS_CURRENCY_CACHE_TTL",
+    3600,
+)
+
+# Rates: provider, seconds they are fresh and seconds they may still be
+# used (while they are refreshed in the background) once they are not
+RATES_PROVIDER = getattr(
+    settings,
+    "CDNX_PAYMENTS_RATES_PROVIDER",
+    "codenerix_payments.currencies.FixerRatesProvider",
+)
+RATES_TTL = getattr(settings, "CDNX_PAYMENTS_RATES_TTL", 3600)
+RATES_STALE_TTL = getattr(settings, "CDNX_PAYMENTS_RATES_STALE_TTL", 86400)
+RATES_TIMEOUT = getattr(settings, "CDNX_PAYMENTS_RATES_TIMEOUT", 5)
+
+# Fixed rates {"EUR": {"USD": 1.08, ...}, ...} used by OfflineRatesProvider
+# and as fallback when the provider fails
+RATES = getattr(settings, "CDNX_PAYMENTS_RATES", {})
+
+CACHE_PREFIX = "codenerix_payments"
+
+
+class CurrencyRegistry:
+    """
+    Currencies by pk or ISO 4217 code, remembered by this process for
+    CURRENCY_LOCAL_TTL seconds and by Django's cache for CURRENCY_CACHE_TTL
+    seconds (saving or deleting a Currency forgets it)
+
+    The same instance is returned to every caller, do not modify it.
+    """
+
+    def __init__(self):
+        self.__local = {}
+        self.__lock = threading.Lock()
+
+    def get(self, pk=None, iso4217=None):
+        # Select key
+        if pk is not None:
+            key = ("pk", pk)
+        else:
+            key = ("iso4217", iso4217)
+
+        # Look in this process
+        now = time.monotonic()
+        with self.__lock:
+            cached = self.__local.get(key, None)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+
+        # Look in Django's cache (the ISO code may have changed meanwhile)
+        cache_key = self.cache_key(*key)
+        currency = cache.get(cache_key)
+        if currency is not None and getattr(currency, key[0]) != key[1]:
+            currency = None
+
+        # Look in the database
+        if currency is None:
+            currency = (
+                apps.get_model("codenerix_payments", "Currency")
+                .objects.filter(**{key[0]: key[1]})
+                .first()
+            )
+            if currency is None:
+                return None
+            # Under both keys, forget() finds the ISO code of the pk
+            cache.set_many(
+                {
+                    self.cache_key("pk", currency.pk): currency,
+                    self.cache_key("iso4217", currency.iso4217): currency,
+                },
+                CURRENCY_CACHE_TTL,
+            )
+
+        # Remember it
+        with self.__lock:
+            self.__local[key] = (now + CURRENCY_LOCAL_TTL, currency)
+
+        # Return the currency
+        return currency
+
+    def cache_key(self, field, value):
+        return "{}:currency:{}:{}".format(CACHE_PREFIX, field, value)
+
+    def forget(self, currency):
+        # Forget it in this process (also under a previous ISO code)
+        codes = {currency.iso4217}
+        with self.__lock:
+            for key, (_expires, cached) in list(self.__local.items()):
+                if cached.pk == currency.pk:
+                    codes.add(cached.iso4217)
+                    del self.__local[key]
+
+        # Forget it in Django's cache (also under a previous ISO code)
+        pk_key = self.cache_key("pk", currency.pk)
+        cached = cache.get(pk_key)
+        if cached is not None:
+            codes.add(cached.iso4217)
+        cache.delete_many(
+            [pk_key] + [self.cache_key("iso4217", code) for code in codes],
+        )
+
+    def clear(self):
+        with self.__lock:
+            self.__local = {}
+
+
+currencies = CurrencyRegistry()
+
+
+def forget_currency(sender, instance, **kwargs):
+    currencies.forget(instance)
+
+
+post_save.connect(forget_currency, sender="codenerix_payments.Currency")
+post_delete.connect(forget_currency, sender="codenerix_payments.Currency")
+
+
+class RatesProvider(abc.ABC):
+    """
+    Source of exchange rates
+    """
+
+    @abc.abstractmethod
+    def rate(self, sell, buy):
+        """
+        How many units of the buy currency are paid for one unit of the
+        sell currency (both are ISO 4217 codes)
+        """
+
+
+class FixerRatesProvider(RatesProvider):
+    """
+    Rates from fixer.io
+    """
+
+    url = "http://api.fixer.io/latest"
+
+    def rate(self, sell, buy):
+        r = requests.get(
+            self.url,
+            params={"base": sell, "symbols": buy},
+            timeout=RATES_TIMEOUT,
+        )
+        r.raise_for_status()
+        return r.json()["rates"][buy]
+
+
+class OfflineRatesProvider(RatesProvider):
+    """
+    Rates from a fixed table, by default settings.CDNX_PAYMENTS_RATES
+    """
+
+    def __init__(self, rates=None):
+        if rates is None:
+            rates = RATES
+        self.rates = rates
+
+    def rate(self, sell, buy):
+        if sell == buy:
+            return 1
+        elif buy in self.rates.get(sell, {}):
+            return self.rates[sell][buy]
+        else:
+            # Use the inverse rate
+            return 1 / self.rates[buy][sell]
+
+
+class CurrencyRates:
+    """
+    Exchange rates cached in Django's cache for RATES_TTL seconds, after
+    that they are still answered for RATES_STALE_TTL seconds while a
+    background thread asks the provider again, so only a rate that was
+    never fetched waits for the provider (RATES_TIMEOUT at most, then the
+    fallback is used)
+    """
+
+    def __init__(self, provider=None, fallback=None):
+        self.__provider = provider
+        self.__fallback = fallback
+        self.__refreshing = set()
+        self.__lock = threading.Lock()
+
+    @property
+    def provider(self):
+        if self.__provider is None:
+            self.__provider = import_string(RATES_PROVIDER)()
+        return self.__provider
+
+    @property
+    def fallback(self):
+        if self.__fallback is None and RATES:
+            self.__fallback = OfflineRatesProvider()
+        return self.__fallback
+
+    def cache_key(self, sell, buy):
+        return "{}:rate:{}:{}".format(CACHE_PREFIX, sell, buy)
+
+    def rate(self, sell, buy):
+        # Look in the cache
+        cached = cache.get(self.cache_key(sell, buy))
+        if cached is not None:
+            rate, fetched = cached
+            age = time.time() - fetched
+            if age < RATES_TTL:
+                return rate
+            elif age < RATES_TTL + RATES_STALE_TTL:
+                self.revalidate(sell, buy)
+                return rate
+
+        # Nothing usable in the cache
+        return self.fetch(sell, buy)
+
+    def fetch(self, sell, buy):
+        try:
+            rate = self.provider.rate(sell, buy)
+        except Exception as e:
+            logger.error(
+                f"RATES: Error getting rate {sell}->{buy} from "
+                f"{self.provider.__class__.__name__}: {e}",
+            )
+            if self.fallback is None:
+                raise
+            return self.fallback.rate(sell, buy)
+
+        # Remember it
+        cache.set(
+            self.cache_key(sell, buy),
+            (rate, time.time()),
+            RATES_TTL + RATES_STALE_TTL,
+        )
+        return rate
+
+    def revalidate(self, sell, buy):
+        # Only one refresh for each pair at the same time
+        with self.__lock:
+            if (sell, buy) in self.__refreshing:
+                return
+            self.__refreshing.add((sell, buy))
+
+        def refresh():
+            try:
+                self.fetch(sell, buy)
+            except Exception:
+                # Already logged, the stale rate is used meanwhile
+                pass
+            finally:
+                with self.__lock:
+                    self.__refreshing.discard((sell, buy))
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+
+currency_rates = CurrencyRates()
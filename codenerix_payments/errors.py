@@ -0,0 +1,675 @@
+#
+# django-codenerix-payments
+#
+# Codenerix GNU
+#
+# Project URL : http://www.codenerix.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# type: ignore
+
+import collections
+import types
+
+from django.utils.translation import gettext_lazy as _
+
+# Categories of the errors reported by the remote systems
+FRAUD = "fraud"
+INSUFFICIENT_FUNDS = "insufficient_funds"
+LIMIT = "limit"
+CARD = "card"
+AUTHENTICATION = "authentication"
+DECLINED = "declined"
+CANCELLED = "cancelled"
+DUPLICATED = "duplicated"
+PENDING = "pending"
+MERCHANT = "merchant"
+SYSTEM = "system"
+UNKNOWN = "unknown"
+
+# Error reported by a remote system
+PaymentErrorInfo = collections.namedtuple(
+    "PaymentErrorInfo",
+    ["code", "message", "category"],
+)
+
+REDSYS_MESSAGES = {
+    "0101": "Tarjeta Caducada.",
+    "0102": "Tarjeta en excepción transitoria o bajo sospecha de fraude.",
+    "0104": "Operación no permitida para esa tarjeta o terminal.",
+    "0106": "Intentos de PIN excedidos.",
+    "0116": "Disponible Insuficiente.",
+    "0118": "Tarjeta no Registrada.",
+    "0125": "Tarjeta no efectiva.",
+    "0129": "Código de seguridad (CVV2/CVC2) incorrecto.",
+    "0180": "Tarjeta ajena al servicio.",
+    "0184": "Error en la autenticación del titular.",
+    "0190": "Denegación sin especificar motivo.",
+    "0191": "Fecha de caducidad errónea.",
+    "0202": (
+        "Tarjeta en excepción transitoria o bajo sospecha de fraude con "
+        "retirada de tarjeta."
+    ),
+    "0904": "Comercio no registrado en FUC.",
+    "0909": "Error de sistema.",
+    "0912": "Emisor no disponible.",
+    "0913": "Pedido repetido.",
+    "0944": "Sesión Incorrecta.",
+    "0950": "Operación de devolución no permitida.",
+    "9064": "Número de posiciones de la tarjeta incorrecto.",
+    "9078": "No existe método de pago válido para esa tarjeta.",
+    "9093": "Tarjeta no existente.",
+    "9094": "Rechazo servidores internacionales.",
+    "9104": (
+        "Comercio con “titular seguro” y titular sin clave de compra segura."
+    ),
+    "9218": "El comercio no permite op. seguras por entrada /operaciones.",
+    "9253": "Tarjeta no cumple el check-digit.",
+    "9256": "El comercio no puede realizar preautorizaciones.",
+    "9257": "Esta tarjeta no permite operativa de preautorizaciones.",
+    "9261": (
+        "Operación detenida por superar el control de restricciones en la "
+        "entrada al SIS."
+    ),
+    "9912": "Emisor no disponible.",
+    "9913": (
+        "Error en la confirmación que el comercio envía al TPV Virtual (solo "
+        "aplicable en la opción de sincronización SOAP)."
+    ),
+    "9914": (
+        "Confirmación “KO” del comercio (solo aplicable en la opción de "
+        "sincronización SOAP)."
+    ),
+    "9915": "A petición del usuario se ha cancelado el pago.",
+    "9928": (
+        "Anulación de autorización en diferido realizada por el SIS (proceso "
+        "batch)."
+    ),
+    "9929": "Anulación de autorización en diferido realizada por el comercio.",
+    "9997": "Se está procesando otra transacción en SIS con la misma tarjeta.",
+    "9998": "Operación en proceso de solicitud de datos de tarjeta.",
+    "9999": "Operación que ha sido redirigida al emisor a autenticar.",
+    "SIS0007": "Error al desmontar el XML de entrada.",
+    "SIS0008": "Error falta Ds_Merchant_MerchantCode.",
+    "SIS0009": "Error de formato en Ds_Merchant_MerchantCode.",
+    "SIS0010": "Error falta Ds_Merchant_Terminal.",
+    "SIS0011": "Error de formato en Ds_Merchant_Terminal.",
+    "SIS0014": "Error de formato en Ds_Merchant_Order.",
+    "SIS0015": "Error falta Ds_Merchant_Currency.",
+    "SIS0016": "Error de formato en Ds_Merchant_Currency.",
+    "SIS0017": "Error no se admiten operaciones en pesetas.",
+    "SIS0018": "Error falta Ds_Merchant_Amount.",
+    "SIS0019": "Error de formato en Ds_Merchant_Amount.",
+    "SIS0020": "Error falta Ds_Merchant_MerchantSignature.",
+    "SIS0021": "Error la Ds_Merchant_MerchantSignature viene vacía.",
+    "SIS0022": "Error de formato en Ds_Merchant_TransactionType.",
+    "SIS0023": "Error Ds_Merchant_TransactionType desconocido.",
+    "SIS0024": "Error Ds_Merchant_ConsumerLanguage tiene mas de 3 posiciones.",
+    "SIS0025": "Error de formato en Ds_Merchant_ConsumerLanguage.",
+    "SIS0026": "Error No existe el comercio / terminal enviado.",
+    "SIS0027": (
+        "Error Moneda enviada por el comercio es diferente a la que tiene "
+        "asignada para ese terminal."
+    ),
+    "SIS0028": "Error Comercio / terminal está dado de baja.",
+    "SIS0030": (
+        "Error en un pago con tarjeta ha llegado un tipo de operación no "
+        "valido."
+    ),
+    "SIS0031": "Método de pago no definido.",
+    "SIS0033": (
+        "Error en un pago con móvil ha llegado un tipo de operación que no "
+        "es ni pago ni preautorización."
+    ),
+    "SIS0034": "Error de acceso a la Base de Datos.",
+    "SIS0037": "El número de teléfono no es válido.",
+    "SIS0038": "Error en java.",
+    "SIS0040": (
+        "Error el comercio / terminal no tiene ningún método de pago "
+        "asignado."
+    ),
+    "SIS0041": "Error en el cálculo de la firma de datos del comercio.",
+    "SIS0042": "La firma enviada no es correcta.",
+    "SIS0043": "Error al realizar la notificación on-line.",
+    "SIS0046": "El BIN de la tarjeta no está dado de alta.",
+    "SIS0051": "Error número de pedido repetido.",
+    "SIS0054": (
+        "Error no existe operación sobre la que realizar la devolución."
+    ),
+    "SIS0055": "Error no existe más de un pago con el mismo número de pedido.",
+    "SIS0056": (
+        "La operación sobre la que se desea devolver no está autorizada."
+    ),
+    "SIS0057": "El importe a devolver supera el permitido.",
+    "SIS0058": (
+        "Inconsistencia de datos, en la validación de una confirmación."
+    ),
+    "SIS0059": (
+        "Error no existe operación sobre la que realizar la devolución."
+    ),
+    "SIS0060": "Ya existe una confirmación asociada a la preautorización.",
+    "SIS0061": (
+        "La preautorización sobre la que se desea confirmar no está "
+        "autorizada."
+    ),
+    "SIS0062": "El importe a confirmar supera el permitido.",
+    "SIS0063": "Error. Número de tarjeta no disponible.",
+    "SIS0064": (
+        "Error. El número de tarjeta no puede tener más de 19 posiciones."
+    ),
+    "SIS0065": "Error. El número de tarjeta no es numérico.",
+    "SIS0066": "Error. Mes de caducidad no disponible.",
+    "SIS0067": "Error. El mes de la caducidad no es numérico.",
+    "SIS0068": "Error. El mes de la caducidad no es válido.",
+    "SIS0069": "Error. Año de caducidad no disponible.",
+    "SIS0070": "Error. El Año de la caducidad no es numérico.",
+    "SIS0071": "Tarjeta caducada.",
+    "SIS0072": "Operación no anulable.",
+    "SIS0074": "Error falta Ds_Merchant_Order.",
+    "SIS0075": (
+        "Error el Ds_Merchant_Order tiene menos de 4 posiciones o más de 12."
+    ),
+    "SIS0076": (
+        "Error el Ds_Merchant_Order no tiene las cuatro primeras posiciones "
+        "numéricas."
+    ),
+    "SIS0078": "Método de pago no disponible.",
+    "SIS0079": "Error al realizar el pago con tarjeta.",
+    "SIS0081": "La sesión es nueva, se han perdido los datos almacenados.",
+    "SIS0084": "El valor de Ds_Merchant_Conciliation es nulo.",
+    "SIS0085": "El valor de Ds_Merchant_Conciliation no es numérico.",
+    "SIS0086": "El valor de Ds_Merchant_Conciliation no ocupa 6 posiciones.",
+    "SIS0089": "El valor de Ds_Merchant_ExpiryDate no ocupa 4 posiciones.",
+    "SIS0092": "El valor de Ds_Merchant_ExpiryDate es nulo.",
+    "SIS0093": "Tarjeta no encontrada en la tabla de rangos.",
+    "SIS0094": "La tarjeta no fue autenticada como 3D Secure.",
+    "SIS0097": "Valor del campo Ds_Merchant_CComercio no válido.",
+    "SIS0098": "Valor del campo Ds_Merchant_CVentana no válido.",
+    "SIS0112": (
+        "Error. El tipo de transacción especificado en "
+        "Ds_Merchant_Transaction_Type no esta permitido."
+    ),
+    "SIS0113": "Excepción producida en el servlet de operaciones.",
+    "SIS0114": "Error, se ha llamado con un GET en lugar de un POST.",
+    "SIS0115": (
+        "Error no existe operación sobre la que realizar el pago de la cuota."
+    ),
+    "SIS0116": (
+        "La operación sobre la que se desea pagar una cuota no es una "
+        "operación válida."
+    ),
+    "SIS0117": (
+        "La operación sobre la que se desea pagar una cuota no está "
+        "autorizada."
+    ),
+    "SIS0118": "Se ha excedido el importe total de las cuotas.",
+    "SIS0119": "Valor del campo Ds_Merchant_DateFrecuency no válido.",
+    "SIS0120": "Valor del campo Ds_Merchant_CargeExpiryDate no válido.",
+    "SIS0121": "Valor del campo Ds_Merchant_SumTotal no válido.",
+    "SIS0122": (
+        "Valor del campo Ds_merchant_DateFrecuency o Ds_Merchant_SumTotal "
+        "tiene formato incorrecto."
+    ),
+    "SIS0123": "Se ha excedido la fecha tope para realizar transacciones.",
+    "SIS0124": (
+        "No ha transcurrido la frecuencia mínima en un pago recurrente "
+        "sucesivo."
+    ),
+    "SIS0132": (
+        "La fecha de Confirmación de Autorización no puede superar en más de "
+        "7 días a la de Preautorización."
+    ),
+    "SIS0133": (
+        "La fecha de Confirmación de Autenticación no puede superar en mas "
+        "de 45 días a la de Autenticación Previa."
+    ),
+    "SIS0139": "Error el pago recurrente inicial está duplicado.",
+    "SIS0142": "Tiempo excedido para el pago.",
+    "SIS0197": (
+        "Error al obtener los datos de cesta de la compra en operación tipo "
+        "pasarela."
+    ),
+    "SIS0198": "Error el importe supera el límite permitido para el comercio.",
+    "SIS0199": (
+        "Error el número de operaciones supera el límite permitido para el "
+        "comercio."
+    ),
+    "SIS0200": (
+        "Error el importe acumulado supera el límite permitido para el "
+        "comercio."
+    ),
+    "SIS0214": "El comercio no admite devoluciones.",
+    "SIS0216": "Error Ds_Merchant_CVV2 tiene mas de 3/4 posiciones.",
+    "SIS0217": "Error de formato en Ds_Merchant_CVV2.",
+    "SIS0218": (
+        "El comercio no permite operaciones seguras por la entrada "
+        "/operaciones."
+    ),
+    "SIS0219": (
+        "Error el número de operaciones de la tarjeta supera el límite "
+        "permitido para el comercio."
+    ),
+    "SIS0220": (
+        "Error el importe acumulado de la tarjeta supera el límite permitido "
+        "para el comercio."
+    ),
+    "SIS0221": "Error el CVV2 es obligatorio.",
+    "SIS0222": "Ya existe una anulación asociada a la preautorización.",
+    "SIS0223": "La preautorización que se desea anular no está autorizada.",
+    "SIS0224": (
+        "El comercio no permite anulaciones por no tener firma ampliada."
+    ),
+    "SIS0225": "Error no existe operación sobre la que realizar la anulación.",
+    "SIS0226": "Inconsistencia de datos, en la validación de una anulación.",
+    "SIS0227": "Valor del campo Ds_Merchan_TransactionDate no válido.",
+    "SIS0229": "No existe el código de pago aplazado solicitado.",
+    "SIS0252": "El comercio no permite el envío de tarjeta.",
+    "SIS0253": "La tarjeta no cumple el check-digit.",
+    "SIS0254": (
+        "El número de operaciones de la IP supera el límite permitido por "
+        "el comercio."
+    ),
+    "SIS0255": (
+        "El importe acumulado por la IP supera el límite permitido por el "
+        "comercio."
+    ),
+    "SIS0256": "El comercio no puede realizar preautorizaciones.",
+    "SIS0257": "Esta tarjeta no permite operativa de preautorizaciones.",
+    "SIS0258": (
+        "Inconsistencia de datos, en la validación de una confirmación."
+    ),
+    "SIS0261": (
+        "Operación detenida por superar el control de restricciones en la "
+        "entrada al SIS."
+    ),
+    "SIS0270": "El comercio no puede realizar autorizaciones en diferido.",
+    "SIS0274": (
+        "Tipo de operación desconocida o no permitida por esta entrada al "
+        "SIS."
+    ),
+    "SIS0298": (
+        "El comercio no permite realizar operaciones de Tarjeta en Archivo."
+    ),
+    "SIS0319": (
+        "El comercio no pertenece al grupo especificado en Ds_Merchant_Group."
+    ),
+    "SIS0321": (
+        "La referencia indicada en Ds_Merchant_Identifier no está asociada "
+        "al comercio."
+    ),
+    "SIS0322": "Error de formato en Ds_Merchant_Group.",
+    "SIS0325": (
+        "Se ha pedido no mostrar pantallas pero no se ha enviado ninguna "
+        "referencia de tarjeta."
+    ),
+    "SIS0334": (
+        "Superado los límites de compra con esta tarjeta o IP (ver "
+        "parámetros en Redsys). [Velocity checks]"
+    ),
+    "SIS0429": (
+        "Error en la versión enviada por el comercio en el parámetro "
+        "Ds_SignatureVersion"
+    ),
+    "SIS0430": "Error al decodificar el parámetro Ds_MerchantParameters",
+    "SIS0431": (
+        "Error del objeto JSON que se envía codificado en el parámetro "
+        "Ds_MerchantParameters"
+    ),
+    "SIS0432": "Error FUC del comercio erróneo",
+    "SIS0433": "Error Terminal del comercio erróneo",
+    "SIS0434": (
+        "Error ausencia de número de pedido en la operación enviada por el "
+        "comercio"
+    ),
+    "SIS0435": "Error en el cálculo de la firma",
+}
+
+YEEPAY_MESSAGES = {
+    "1120": "超过失败次数限制",
+    "1123": "该卡已过期",
+    "1117": "未找到可用通道，请换卡重试",
+    "1116": "您的账号需要在银行签约，请重新发起交易",
+    "0001": "交易失败，请稍后重试",
+    "9001": "请求重复,请稍候重试",
+    "1077": "绑卡需要加验和验证码",
+    "1078": "未查到对应卡信息",
+    "1098": "系统异常，请联系易宝支付",
+    "1080": "交易失败，请稍后重试",
+    "1081": "商户尚未开通此银行业务",
+    "1082": "银行系统维护中，请稍后重试",
+    "1083": "发卡行不允许此卡交易，请联系发卡行",
+    "1084": "请拨打建行95533客服电话，接通后按#058核实交易，核实成功后可重新进行支付",
+    "1085": "请拨打建行95533客服电话，接通后按#058进行交易核实，核实成功后方能重新进行支付交易",
+    "1086": "卡片有效期错误，请核对后重试",
+    "1087": "银行预留手机号变更，绑卡关系无效",
+    "1088": "该卡未开通电子支付功能或卡信息有误",
+    "1089": "短信验证码发送失败",
+    "1090": "该笔交易金额低于银行规定最低限额，请换卡支付",
+    "1091": "缺少必要的银行卡信息",
+    "1092": "超过银行交易金额限制",
+    "1093": "交易金额超限",
+    "1094": "可用余额不足",
+    "1095": "发卡行不允许此卡交易",
+    "1096": "银行系统异常，请稍后重试",
+    "1097": "无效卡号，请核对后重新输入",
+    "1099": "卡信息输入错误次数超限，请联系发卡行解锁",
+    "1100": "密码有误，请确认后重新提交交易",
+    "1101": "持卡人证件信息有误，请确认后重新提交交易",
+    "1102": "银行卡开户姓名有误，请确认后重新提交交易",
+    "1103": "卡信息有误，请核对后重试",
+    "1104": "银行系统异常，请稍后重试",
+    "1105": "重复交易，请稍后重试",
+    "1106": "该卡不在该银行无卡支付业务范围内，请持卡人联系发卡行",
+    "1107": "银行预留手机号有误，请确认后重新提交交易",
+    "1001": "原交易订单不存在",
+    "1002": "订单已存在",
+    "1003": "创建订单异常",
+    "1004": "交易订单状态错误",
+    "1005": "交易订单已超时取消",
+    "1006": "订单支付信息不存在",
+    "1007": "订单支付状态异常",
+    "1008": "订单金额错误",
+    "1009": "订单入账状态异常",
+    "1010": "订单未入账",
+    "1011": "订单入账记录已经存在",
+    "1020": "商户未开通产品",
+    "1021": "订单状态未同步",
+    "1022": "银行卡无对应卡bin",
+    "1023": "不支持的卡种",
+    "1024": "计费模版不存在",
+    "1025": "由易宝下发短验",
+    "1026": "由商户下发短验",
+    "1027": "由银行下发短验",
+    "1028": "支付处理中",
+    "1029": "原始请求数据为空",
+    "1030": "验证处理中",
+    "1031": "恢复原始请求数据异常",
+    "1032": "验证码发送次数超限",
+    "1033": "验证码验证错误",
+    "1034": "验证码超过重试次数",
+    "1035": "验证码已失效",
+    "1038": "订单类型错误",
+    "1039": "查询清算结果为空",
+    "1040": "分账金额大于等于订单金额",
+    "1041": "分账订单号请求重复",
+    "1042": "子分账方数量超限",
+    "1043": "收款方入账订单状态异常",
+    "1044": "未配置商户计费信息",
+    "1045": "未配置商户场景",
+    "1046": "未配置商户银行验证要素",
+    "1047": "缺少必填要素",
+    "1048": "短验发送失败",
+    "1049": "订单已支付成功",
+    "1050": "支付信息已存在",
+    "1051": "验证码验证方式错误",
+    "1052": "未查询到绑卡记录",
+    "1053": "绑卡ID超时",
+    "1054": "绑卡需要加验",
+    "1055": "绑卡已经成功",
+    "1056": "绑卡失败请发起新的请求",
+    "1057": "绑卡验证中",
+    "1058": "订单已终态请以查询结果为准",
+    "1059": "传入绑卡ID不存在",
+    "1060": "收款方异步通知地址为空",
+    "1067": "付款方未开通会员支付",
+    "1068": "预授权请求处理中",
+    "1069": "预授权完成金额大于发起金额",
+    "1070": "订单已经预授权完成",
+    "1071": "订单已经预授权取消",
+    "1072": "订单已经预授权发起成功",
+    "1073": "订单未支付",
+    "1079": "订单未支付成功",
+    "1108": "黑名单阻断",
+    "1109": "交易限额，超过商户单笔交易限额",
+    "1110": "交易限额，超过商户日累计交易限额",
+    "1111": "交易限额，超过商户月累计交易限额",
+    "1112": "交易限额，超过商户日累计交易次数",
+    "1113": "交易限额，超过商户月累计交易次数",
+    "1115": "交易拦截--规则系统，超过交易限次",
+}
+
+# Codes of each category, the ones not listed are errors in the merchant's
+# integration or configuration
+REDSYS_CATEGORIES = {
+    FRAUD: ["0102", "0202", "9261", "SIS0261", "SIS0334"],
+    INSUFFICIENT_FUNDS: ["0116"],
+    LIMIT: [
+        "SIS0057",
+        "SIS0062",
+        "SIS0118",
+        "SIS0123",
+        "SIS0198",
+        "SIS0199",
+        "SIS0200",
+        "SIS0219",
+        "SIS0220",
+        "SIS0254",
+        "SIS0255",
+    ],
+    CARD: [
+        "0101",
+        "0104",
+        "0118",
+        "0125",
+        "0180",
+        "0191",
+        "9064",
+        "9078",
+        "9093",
+        "9253",
+        "9257",
+        "SIS0046",
+        "SIS0063",
+        "SIS0064",
+        "SIS0065",
+        "SIS0066",
+        "SIS0067",
+        "SIS0068",
+        "SIS0069",
+        "SIS0070",
+        "SIS0071",
+        "SIS0093",
+        "SIS0253",
+        "SIS0257",
+    ],
+    AUTHENTICATION: ["0106", "0129", "0184", "9104", "SIS0094"],
+    DECLINED: ["0190", "9094", "SIS0079"],
+    CANCELLED: ["9915", "9928", "9929", "SIS0142"],
+    DUPLICATED: ["0913", "9997", "SIS0051", "SIS0139"],
+    PENDING: ["9998", "9999"],
+    SYSTEM: [
+        "0909",
+        "0912",
+        "0944",
+        "9912",
+        "SIS0034",
+        "SIS0038",
+        "SIS0043",
+        "SIS0081",
+        "SIS0113",
+    ],
+}
+YEEPAY_CATEGORIES = {
+    FRAUD: ["1108", "1115"],
+    INSUFFICIENT_FUNDS: ["1094"],
+    LIMIT: [
+        "1032",
+        "1034",
+        "1090",
+        "1092",
+        "1093",
+        "1099",
+        "1109",
+        "1110",
+        "1111",
+        "1112",
+        "1113",
+        "1120",
+    ],
+    CARD: [
+        "1022",
+        "1023",
+        "1078",
+        "1083",
+        "1086",
+        "1087",
+        "1088",
+        "1091",
+        "1095",
+        "1097",
+        "1102",
+        "1103",
+        "1106",
+        "1107",
+        "1116",
+        "1117",
+        "1123",
+    ],
+    AUTHENTICATION: [
+        "1033",
+        "1035",
+        "1051",
+        "1054",
+        "1077",
+        "1084",
+        "1085",
+        "1100",
+        "1101",
+    ],
+    CANCELLED: ["1005"],
+    DUPLICATED: [
+        "1002",
+        "1011",
+        "1041",
+        "1049",
+        "1050",
+        "1055",
+        "1070",
+        "1071",
+        "1072",
+        "1105",
+        "9001",
+    ],
+    PENDING: ["1028", "1030", "1057", "1068"],
+    SYSTEM: [
+        "0001",
+        "1003",
+        "1031",
+        "1048",
+        "1080",
+        "1082",
+        "1089",
+        "1096",
+        "1098",
+        "1104",
+    ],
+}
+
+
+def build_catalog(messages, categories, aliases=None):
+    """
+    Build a frozen table code -> PaymentErrorInfo, aliases(code) returns
+    other spellings of a code that must find the same error
+    """
+
+    # Category of each code
+    category_of = {}
+    for category, codes in categories.items():
+        for code in codes:
+            category_of[code] = category
+
+    # Errors as they are documented
+    catalog = {
+        code: PaymentErrorInfo(
+            code,
+            message,
+            category_of.get(code, MERCHANT),
+        )
+        for code, message in messages.items()
+    }
+
+    # Other spellings (documented codes always win)
+    if aliases:
+        for code, info in list(catalog.items()):
+            for alias in aliases(code):
+                catalog.setdefault(alias, info)
+
+    return types.MappingProxyType(catalog)
+
+
+def redsys_aliases(code):
+    # Redsys sends SIS codes with and without prefix
+    if code.startswith("SIS"):
+        return [code[3:]]
+    else:
+        return ["SIS{}".format(code)]
+
+
+REDSYS_ERRORS = build_catalog(
+    REDSYS_MESSAGES,
+    REDSYS_CATEGORIES,
+    redsys_aliases,
+)
+YEEPAY_ERRORS = build_catalog(YEEPAY_MESSAGES, YEEPAY_CATEGORIES)
+
+
+def redsys_error_info(code):
+    info = REDSYS_ERRORS.get(code, None)
+    if info is None:
+        info = PaymentErrorInfo(
+            code,
+            _("UNKNOWN CODE {code}").format(code=code),
+            UNKNOWN,
+        )
+    return info
+
+
+def yeepay_error_info(code):
+    info = YEEPAY_ERRORS.get(code, None)
+    if info is None:
+        info = PaymentErrorInfo(
+            code,
+            _("未知的错误代码 {code}").format(code=code),
+            UNKNOWN,
+        )
+    return info
+
+
+ERROR_INFO = {
+    "redsys": redsys_error_info,
+    "redsysxml": redsys_error_info,
+    "yeepay": yeepay_error_info,
+}
+
+
+def classify_errors(protocol, codes):
+    """
+    Count the error codes of a protocol by category, for example with the
+    codes stored in PaymentAnswer.ref:
+
+    classify_errors(
+        "redsys",
+        PaymentAnswer.objects.filter(
+            error=True,
+            payment__protocol="redsys",
+        ).values_list("ref", flat=True).iterator(),
+    )
+    """
+
+    # Each distinct code is looked up once
+    error_info = ERROR_INFO[protocol]
+    counter = collections.Counter(code for code in codes if code)
+    categories = collections.Counter()
+    for code, total in counter.items():
+        categories[error_info(code).category] += total
+    return categories
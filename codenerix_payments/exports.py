@@ -0,0 +1,309 @@
+#
+# django-codenerix-payments
+#
+# Codenerix GNU
+#
+# Project URL : http://www.codenerix.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# type: ignore
+
+import csv
+import datetime
+import io
+import json
+from decimal import Decimal
+
+from django.apps import apps
+from django.conf import settings
+from django.db.models import F, Prefetch, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+# Payment requests read from the database at once
+EXPORT_CHUNK = getattr(settings, "CDNX_PAYMENTS_EXPORT_CHUNK", 1000)
+
+# Output formats: one CSV row or JSON object per payment request, or one
+# JSON object per chunk with the values of every column in lists
+EXPORT_FORMATS = ["csv", "jsonl", "columns"]
+
+
+def related(name, fields):
+    # Rows of a prefetched relation (see export_queryset()) as dicts with
+    # some of their fields
+    def get(pr):
+        return [
+            {field: getattr(row, field) for field in fields}
+            for row in getattr(pr, "export_{}".format(name))
+        ]
+
+    return get
+
+
+# Columns that can be exported: (value of the payment request, relation
+# to prefetch for it), related rows are loaded without their payload
+EXPORT_COLUMNS = {
+    "cursor": (lambda pr: export_cursor(pr), None),
+    "locator": (lambda pr: pr.locator, None),
+    "order": (lambda pr: pr.order, None),
+    "order_ref": (lambda pr: pr.order_ref, None),
+    "ref": (lambda pr: pr.ref, None),
+    "platform": (lambda pr: pr.platform, None),
+    "protocol": (lambda pr: pr.protocol, None),
+    "real": (lambda pr: pr.real, None),
+    "error": (lambda pr: pr.error, None),
+    "cancelled": (lambda pr: pr.cancelled, None),
+    "total": (lambda pr: pr.total, None),
+    "currency": (lambda pr: pr.currency.iso4217, None),
+    "notes": (lambda pr: pr.notes, None),
+    "user": (lambda pr: pr.user_id, None),
+    "request_date": (lambda pr: pr.request_date, None),
+    "answer_date": (lambda pr: pr.answer_date, None),
+    "paid": (lambda pr: pr.is_paid(), None),
+    "total_returned": (lambda pr: pr.total_returned, None),
+    "returned": (lambda pr: pr.returned(), None),
+    "answers": (
+        related("paymentanswers", ["ref", "error", "answer_date"]),
+        "paymentanswers",
+    ),
+    "confirmations": (
+        related("paymentconfirmations", ["ref", "action", "error", "created"]),
+        "paymentconfirmations",
+    ),
+    "returns": (
+        related(
+            "paymentreturns",
+            ["return_order_ref", "amount", "error", "answer_date"],
+        ),
+        "paymentreturns",
+    ),
+}
+
+EXPORT_DEFAULT_COLUMNS = [
+    "locator",
+    "order_ref",
+    "platform",
+    "protocol",
+    "total",
+    "currency",
+    "request_date",
+    "paid",
+    "returned",
+    "answers",
+    "confirmations",
+    "returns",
+    "cursor",
+]
+
+
+def export_cursor(pr):
+    # Position of a payment request in the export: request date (empty
+    # when it has none, they go first) and pk
+    if pr.request_date is None:
+        return "|{}".format(pr.pk)
+    return "{}|{}".format(pr.request_date.isoformat(), pr.pk)
+
+
+def parse_cursor(cursor):
+    """
+    (request_date, pk) of a cursor from export_cursor(), ValueError when it
+    is not valid
+    """
+    date, sep, pk = cursor.rpartition("|")
+    when = parse_datetime(date) if date else None
+    if not sep or (date and when is None) or not pk.isdigit():
+        raise ValueError("Cursor '{}' is not valid".format(cursor))
+    return (when, int(pk))
+
+
+def parse_when(value):
+    """
+    Date or date and time as an aware datetime (in the current timezone
+    when it has none), ValueError when it is not valid
+    """
+    when = parse_datetime(value)
+    if when is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError("'{}' is not a date".format(value))
+        when = datetime.datetime.combine(day, datetime.time())
+    if timezone.is_naive(when):
+        when = timezone.make_aware(when)
+    return when
+
+
+def export_value(value):
+    # Values as JSON can hold them
+    if isinstance(value, Decimal):
+        return str(value)
+    elif isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    elif isinstance(value, list):
+        return [
+            {key: export_value(item) for key, item in row.items()}
+            for row in value
+        ]
+    return value
+
+
+def export_queryset(
+    columns,
+    since=None,
+    until=None,
+    cursor=None,
+    using=None,
+    queryset=None,
+):
+    """
+    Payment requests to export ordered by request_date (those without one
+    first) and pk, those of [since, until) after cursor, with what the
+    columns need
+
+    queryset limits the payment requests to export (all of them when it
+    is None), views give the ones the user can see.
+    """
+    model = apps.get_model("codenerix_payments", "PaymentRequest")
+    if queryset is None:
+        queryset = model.objects.all()
+    queryset = (
+        queryset.using(using)
+        .select_related("currency")
+        .with_status()
+        .without_payload()
+        .order_by(F("request_date").asc(nulls_first=True), "pk")
+    )
+    if since is not None:
+        queryset = queryset.filter(request_date__gte=since)
+    if until is not None:
+        queryset = queryset.filter(request_date__lt=until)
+    if cursor:
+        date, pk = parse_cursor(cursor)
+        if date is None:
+            queryset = queryset.filter(
+                Q(request_date__isnull=False)
+                | Q(request_date__isnull=True, pk__gt=pk),
+            )
+        else:
+            queryset = queryset.filter(
+                Q(request_date__gt=date) | Q(request_date=date, pk__gt=pk),
+            )
+
+    # Prefetch the related rows with only the exported fields
+    for column in columns:
+        relation = EXPORT_COLUMNS[column][1]
+        if relation:
+            related_model = model._meta.get_field(relation).related_model
+            queryset = queryset.prefetch_related(
+                Prefetch(
+                    relation,
+                    queryset=related_model.objects.without_payload().order_by(
+                        "pk",
+                    ),
+                    to_attr="export_{}".format(relation),
+                ),
+            )
+    return queryset
+
+
+def export_rows(columns, chunk_size=EXPORT_CHUNK, **kwargs):
+    """
+    Iterator with a list of the values of the columns for every payment
+    request (see export_queryset() for kwargs), reading chunk_size at a
+    time, unknown columns and cursors raise ValueError right away
+    """
+    unknown = [column for column in columns if column not in EXPORT_COLUMNS]
+    if unknown:
+        raise ValueError("Unknown columns: {}".format(", ".join(unknown)))
+
+    getters = [EXPORT_COLUMNS[column][0] for column in columns]
+    queryset = export_queryset(columns, **kwargs)
+    return (
+        [export_value(get(pr)) for get in getters]
+        for pr in queryset.iterator(chunk_size=chunk_size)
+    )
+
+
+def export_csv(columns, rows):
+    # Related rows go as JSON in their cell
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def line(values):
+        writer.writerow(values)
+        text = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return text
+
+    yield line(columns)
+    for row in rows:
+        yield line(
+            [
+                json.dumps(value) if isinstance(value, list) else value
+                for value in row
+            ],
+        )
+
+
+def export_jsonl(columns, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(columns, row))) + "\n"
+
+
+def export_columns(columns, rows, chunk_size=EXPORT_CHUNK):
+    # One {"rows": n, "columns": {column: [values]}} per chunk_size rows
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield columnar(columns, chunk)
+            chunk = []
+    if chunk:
+        yield columnar(columns, chunk)
+
+
+def columnar(columns, chunk):
+    return (
+        json.dumps(
+            {
+                "rows": len(chunk),
+                "columns": dict(zip(columns, map(list, zip(*chunk)))),
+            },
+        )
+        + "\n"
+    )
+
+
+def export(output, columns=None, chunk_size=EXPORT_CHUNK, **kwargs):
+    """
+    Payment requests exported in the output format (see EXPORT_FORMATS) as
+    an iterator of strings, memory does not grow with the number of rows
+
+    columns defaults to EXPORT_DEFAULT_COLUMNS, the "cursor" column holds
+    the value to give as cursor to continue after that row.
+    """
+    if output not in EXPORT_FORMATS:
+        raise ValueError(
+            "Unknown format '{}', you can use: {}".format(
+                output,
+                ", ".join(EXPORT_FORMATS),
+            ),
+        )
+    columns = list(columns or EXPORT_DEFAULT_COLUMNS)
+    rows = export_rows(columns, chunk_size=chunk_size, **kwargs)
+    if output == "csv":
+        return export_csv(columns, rows)
+    elif output == "jsonl":
+        return export_jsonl(columns, rows)
+    else:
+        return export_columns(columns, rows, chunk_size=chunk_size)
@@ -0,0 +1,169 @@
+#
+# django-codenerix-payments
+#
+# Codenerix GNU
+#
+# Project URL : http://www.codenerix.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# type: ignore
+
+import bisect
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Seconds every HTTP request to a payment system may take, platforms in
+# settings.PAYMENTS may set their own "timeout"
+GATEWAY_TIMEOUT = getattr(settings, "CDNX_PAYMENTS_GATEWAY_TIMEOUT", 30)
+
+# Calls to the same platform running at once in this process, platforms in
+# settings.PAYMENTS may set their own "concurrency"
+GATEWAY_CONCURRENCY = getattr(
+    settings,
+    "CDNX_PAYMENTS_GATEWAY_CONCURRENCY",
+    16,
+)
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def gateway_timeout(platform):
+    return settings.PAYMENTS.get(platform, {}).get("timeout", GATEWAY_TIMEOUT)
+
+
+def gateway_concurrency(platform):
+    return settings.PAYMENTS.get(platform, {}).get(
+        "concurrency",
+        GATEWAY_CONCURRENCY,
+    )
+
+
+class GatewayBusy(Exception):
+    """
+    Raised when a platform has all its calls running for longer than its
+    timeout and one more call can not wait for them
+    """
+
+
+class LatencyHistogram:
+    """
+    Count of calls by latency bucket (LATENCY_BUCKETS plus one for the
+    slower ones) with their total time, not thread safe by itself
+    """
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds):
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def snapshot(self):
+        return {
+            "buckets": dict(
+                zip(LATENCY_BUCKETS + (float("inf"),), self.buckets),
+            ),
+            "count": self.count,
+            "total": self.total,
+        }
+
+
+class Gateway:
+    """
+    Every call to a payment system goes through call(): at most
+    gateway_concurrency(platform) of them run at once for each platform
+    and their latencies are kept by platform, operation and outcome ("ok",
+    "error" or "busy") in histograms()
+
+    Timeouts of the HTTP requests are set by the clients (see
+    codenerix_payments.clients) from gateway_timeout(platform).
+    """
+
+    def __init__(self):
+        self.__slots = {}
+        self.__histograms = {}
+        self.__lock = threading.Lock()
+
+    def slots(self, platform):
+        # Semaphore for the platform, a new one if its limit changes
+        limit = gateway_concurrency(platform)
+        with self.__lock:
+            cached = self.__slots.get(platform, None)
+            if cached is None or cached[0] != limit:
+                cached = (limit, threading.BoundedSemaphore(limit))
+                self.__slots[platform] = cached
+        return cached[1]
+
+    def call(self, platform, operation, func, *args, **kwargs):
+        # Wait for a free slot
+        slots = self.slots(platform)
+        if not slots.acquire(timeout=gateway_timeout(platform)):
+            self.observe(platform, operation, "busy", 0)
+            logger.error(
+                f"GATEWAY: {operation} on platform {platform} is busy, "
+                "no free slot",
+            )
+            raise GatewayBusy(
+                "Platform '{}' is busy, no free slot for {}".format(
+                    platform,
+                    operation,
+                ),
+            )
+
+        # Call the payment system
+        outcome = "error"
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+            outcome = "ok"
+            return result
+        finally:
+            slots.release()
+            self.observe(
+                platform,
+                operation,
+                outcome,
+                time.perf_counter() - start,
+            )
+
+    def observe(self, platform, operation, outcome, seconds):
+        with self.__lock:
+            key = (platform, operation, outcome)
+            histogram = self.__histograms.get(key, None)
+            if histogram is None:
+                histogram = LatencyHistogram()
+                self.__histograms[key] = histogram
+            histogram.observe(seconds)
+
+    def histograms(self):
+        with self.__lock:
+            return {
+                key: histogram.snapshot()
+                for key, histogram in self.__histograms.items()
+            }
+
+    def reset(self):
+        with self.__lock:
+            self.__histograms = {}
+
+
+gateway = Gateway()
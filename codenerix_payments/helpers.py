@@ -17,6 +17,69 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
+import threading
+
+from django.urls import get_resolver, get_urlconf, resolve, reverse
+
+# View behind the reverse name of a PaymentRequest
+NotifyTarget = collections.namedtuple(
+    "NotifyTarget",
+    ["view_class", "func", "payment_paid", "payment_exception"],
+)
+
+_notify_targets = {}
+_notify_targets_lock = threading.Lock()
+
+
+def notify_target(rev):
+    """
+    Return the NotifyTarget for the reverse name rev, it is resolved once
+    per urlconf and resolved again when the urlconf is reloaded (it raises
+    NoReverseMatch like reverse())
+    """
+
+    # Get the resolver in use, Django builds a new one when the urlconf
+    # is reloaded
+    urlconf = get_urlconf()
+    resolver = get_resolver(urlconf)
+
+    # Look for a target resolved with the same resolver
+    with _notify_targets_lock:
+        cached = _notify_targets.get((urlconf, rev), None)
+    if cached is not None and cached[0] is resolver:
+        return cached[1]
+
+    # Resolve reverse
+    func = resolve(
+        reverse(
+            rev,
+            kwargs={
+                "locator": 0,
+                "action": "success",
+                "error": 0,
+            },
+        ),
+    ).func
+
+    # Detect if it is class based view
+    if hasattr(func, "view_class"):
+        target = NotifyTarget(
+            func.view_class,
+            None,
+            hasattr(func.view_class, "payment_paid"),
+            hasattr(func.view_class, "payment_exception"),
+        )
+    else:
+        target = NotifyTarget(None, func, True, True)
+
+    # Remember it
+    with _notify_targets_lock:
+        _notify_targets[(urlconf, rev)] = (resolver, target)
+
+    # Return the target
+    return target
+
 
 def url_path(url, action):
     return "/{}action/[a-zA-Z0-9]+/{}/$".format(url, action)
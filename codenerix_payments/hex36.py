@@ -0,0 +1,113 @@
+#
+# django-codenerix-payments
+#
+# Codenerix GNU
+#
+# Project URL : http://www.codenerix.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# type: ignore
+
+from functools import lru_cache
+
+from codenerix.helpers import CodenerixEncoder
+
+# Order references are orders in base 36 with the "hex36" digits of
+# CodenerixEncoder, filled on the left up to LENGTH characters with FILL
+DIGITS = CodenerixEncoder.codenerix_numeric_dic["hex36"]
+LENGTH = 7
+FILL = "A"
+
+# Orders and references remembered by encode() and decode()
+CACHE_SIZE = 65536
+
+VALUES = {digit: value for value, digit in enumerate(DIGITS)}
+BASE = len(DIGITS)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def encode(order):
+    """
+    Order reference of an order number, the same string as
+    CodenerixEncoder().numeric_encode(order, "hex36", LENGTH, FILL)
+    """
+    string = ""
+    while True:
+        order, mod = divmod(order, BASE)
+        string = DIGITS[mod] + string
+        if not order:
+            break
+    return string.rjust(LENGTH, FILL)
+
+
+def candidates(ref):
+    """
+    Every order number encoded as ref, from the smallest one
+
+    FILL is a digit too ("A" is 13), so the fill can not be told apart from
+    the number: "AAAJRHY" is the reference of the numbers written "JRHY",
+    "AJRHY", "AAJRHY" and "AAAJRHY". Longer references were not filled.
+    Raises ValueError when ref has characters that are not DIGITS.
+    """
+    if len(ref) == LENGTH:
+        tail = ref.lstrip(FILL)
+    else:
+        tail = ref
+
+    # Number written without the fill
+    number = 0
+    for digit in tail:
+        try:
+            number = number * BASE + VALUES[digit]
+        except KeyError:
+            raise ValueError(
+                "Order reference '{}' has a character out of hex36: "
+                "'{}'".format(ref, digit),
+            )
+
+    # Encoded numbers never start with a zero digit unless they are 0
+    numbers = []
+    if tail and (tail[0] != DIGITS[0] or len(tail) == 1):
+        numbers.append(number)
+
+    # Add the fill as digits one by one
+    for size in range(len(tail), len(ref)):
+        number += VALUES[FILL] * BASE**size
+        numbers.append(number)
+    return numbers
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def decode(ref):
+    """
+    Smallest order number encoded as ref (see candidates())
+    """
+    numbers = candidates(ref)
+    if not numbers:
+        raise ValueError("Order reference '{}' is not valid".format(ref))
+    return numbers[0]
+
+
+def encode_many(orders):
+    """
+    Order references of many order numbers (any iterable of integers, a
+    numpy array included)
+    """
+    return [encode(int(order)) for order in orders]
+
+
+def decode_many(refs):
+    """
+    Smallest order number of many order references
+    """
+    return [decode(ref) for ref in refs]
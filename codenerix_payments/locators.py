@@ -0,0 +1,67 @@
+#
+# django-codenerix-payments
+#
+# Codenerix GNU
+#
+# Project URL : http://www.codenerix.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# type: ignore
+
+import os
+import secrets
+import threading
+
+
+class LocatorGenerator:
+    """
+    Locators of 64 hexadecimal characters made of:
+
+    - 16: random prefix of this process (chosen again after a fork)
+    - 16: counter of this process
+    - 32: random, so a locator can not be guessed from another one
+
+    Prefix and counter make them unique without asking the database, two
+    processes only collide if they draw the same 64 bits prefix.
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__pid = None
+        self.__prefix = None
+        self.__counter = 0
+
+    def reserve(self, count):
+        # Take count numbers from the counter of this process
+        with self.__lock:
+            pid = os.getpid()
+            if pid != self.__pid:
+                self.__pid = pid
+                self.__prefix = secrets.token_hex(8)
+                self.__counter = 0
+            first = self.__counter
+            self.__counter += count
+            return (self.__prefix, first)
+
+    def next(self):
+        return self.bulk(1)[0]
+
+    def bulk(self, count):
+        prefix, first = self.reserve(count)
+        return [
+            "{}{:016x}{}".format(prefix, number, secrets.token_hex(16))
+            for number in range(first, first + count)
+        ]
+
+
+locators = LocatorGenerator()
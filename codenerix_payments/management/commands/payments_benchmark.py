@@ -0,0 +1,457 @@
+#
+# django-codenerix-payments
+#
+# Codenerix GNU
+#
+# Project URL : http://www.codenerix.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import base64
+import datetime
+import hashlib
+import json
+import math
+import random
+import time
+from decimal import ROUND_CEILING, Decimal
+
+from codenerix.helpers import CodenerixEncoder
+from codenerix_lib.debugger import Debugger
+from Crypto.PublicKey import RSA  # nosec B413
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.urls import path, resolve, reverse
+from django.views.generic import View
+from yop_python_sdk.security.encryptor.rsaencryptor import RsaEncryptor
+
+from codenerix_payments import hex36  # type: ignore
+from codenerix_payments.helpers import notify_target  # type: ignore
+from codenerix_payments.locators import LocatorGenerator  # type: ignore
+from codenerix_payments.models import (  # type: ignore
+    PaymentAnswer,
+    PaymentConfirmation,
+    PaymentRequest,
+    PaymentReturn,
+    redsys_signature,
+)
+from codenerix_payments.money import Money  # type: ignore
+from codenerix_payments.security import (  # type: ignore
+    RedsysSigner,
+    YeepayKeyStore,
+)
+
+# Redsys public key for the test environment
+REDSYS_TEST_KEY = "sq7HjrUOBfKmC576ILgskD5srU870gJ7"
+
+# Rows in a list page
+PAGE_SIZE = 50
+
+
+class Command(BaseCommand, Debugger):
+    """
+    Every benchmark runs a baseline and the current code path. Baselines
+    are synthetic: small reconstructions of what the code did before each
+    change (the old code is not kept), so speedups are an estimate and not
+    a measure against a previous release.
+    """
+
+    # Show this when the user types help
+    help = (
+        "Measure the speed of the payments hot paths against synthetic "
+        "baselines"
+    )
+
+    benchmarks = [
+        "redsys",
+        "yeepay",
+        "notify",
+        "money",
+        "payload",
+        "locator",
+        "hex36",
+    ]
+
+    def add_arguments(self, parser):
+        # Named (optional) arguments
+        parser.add_argument(
+            "--bench",
+            action="append",
+            dest="bench",
+            help="Benchmarks to run: {}".format(", ".join(self.benchmarks)),
+        )
+
+        # Named (optional) arguments
+        parser.add_argument(
+            "--iterations",
+            action="store",
+            dest="iterations",
+            type=int,
+            default=10000,
+            help="Number of iterations for each benchmark",
+        )
+
+    def handle(self, *args, **options):
+        # Autoconfigure Debugger
+        self.set_name("BENCHMARK")
+        self.set_debug()
+
+        # Arguments
+        benchs = options["bench"] or self.benchmarks
+        for bench in benchs:
+            if bench not in self.benchmarks:
+                raise CommandError(
+                    "Unknown benchmark '{}', you can use: {}".format(
+                        bench,
+                        ", ".join(self.benchmarks),
+                    ),
+                )
+        iterations = options["iterations"]
+
+        # Run benchmarks
+        for bench in benchs:
+            self.debug("Benchmark: {}".format(bench), color="blue")
+            getattr(self, "bench_{}".format(bench))(iterations)
+
+    def measure(self, name, iterations, func):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        self.debug(
+            "{:<42} {:>12.0f} ops/s".format(name, iterations / elapsed),
+            color="cyan",
+        )
+        return elapsed
+
+    def baseline(self, name, iterations, func):
+        # Reconstruction of the previous code path, not the original code
+        return self.measure(
+            "{} (synthetic)".format(name),
+            iterations,
+            func,
+        )
+
+    def compare(self, before, after):
+        self.debug(
+            "Speedup over synthetic baseline: x{:.2f}".format(before / after),
+            color="green",
+        )
+
+    def bench_redsys(self, iterations):
+        # Prepare a realistic notification payload
+        orders = ["{:07d}".format(i % 1000) for i in range(iterations)]
+        paramsb64 = [
+            base64.b64encode(
+                json.dumps(
+                    {
+                        "Ds_Amount": "1200",
+                        "Ds_Currency": "978",
+                        "Ds_Order": order,
+                        "Ds_MerchantCode": "999008881",
+                        "Ds_Terminal": "001",
+                        "Ds_Response": "0000",
+                    },
+                ).encode(),
+            ).decode()
+            for order in orders
+        ]
+
+        # Signature built from scratch for every call
+        def legacy():
+            for order, params in zip(orders, paramsb64):
+                redsys_signature(
+                    base64.b64decode(REDSYS_TEST_KEY),
+                    order,
+                    params,
+                    recode=True,
+                )
+
+        # Signature from a single signer
+        def signer():
+            RedsysSigner(base64.b64decode(REDSYS_TEST_KEY)).sign_many(
+                orders,
+                paramsb64,
+                recode=True,
+            )
+
+        before = self.baseline("redsys_signature", iterations, legacy)
+        after = self.measure("RedsysSigner.sign_many", iterations, signer)
+        self.compare(before, after)
+
+    def bench_yeepay(self, iterations):
+        # Prepare a key pair like the ones stored in settings.PAYMENTS
+        key = RSA.generate(2048)
+        public_key = "".join(
+            key.publickey().export_key().decode().splitlines()[1:-1],
+        )
+        private_key = "".join(
+            key.export_key(pkcs=8).decode().splitlines()[1:-1],
+        )
+        payments = {
+            "yeepay": {"public_key": public_key, "private_key": private_key},
+        }
+
+        # Prepare a signed notification
+        data = "customerIdentification=app&orderId=AAAAAAB&status=SUCCESS"
+        signature = RsaEncryptor(
+            private_key=RSA.import_key(key.export_key(pkcs=8)),
+        ).signature(data)[0]
+
+        # Keys parsed on every callback
+        def legacy():
+            for _i in range(iterations):
+                RsaEncryptor(
+                    public_key=RSA.import_key(
+                        "-----BEGIN PUBLIC KEY-----\n"
+                        + public_key
+                        + "\n-----END PUBLIC KEY-----",
+                    ),
+                ).verify_signature(data, signature)
+
+        # Keys from the key store
+        keystore = YeepayKeyStore()
+
+        def cached():
+            for _i in range(iterations):
+                keystore.encryptor("yeepay").verify_signature(data, signature)
+
+        with override_settings(PAYMENTS=payments):
+            before = self.baseline("RSA.import_key", iterations, legacy)
+            after = self.measure("YeepayKeyStore", iterations, cached)
+        self.compare(before, after)
+        self.debug("Key store: {}".format(keystore.stats()), color="cyan")
+
+    def bench_notify(self, iterations):
+        # Prepare a large urlconf with the notified view at the end
+        class PaidView(View):
+            def payment_paid(self, request, locator, answer):
+                pass
+
+        urlpatterns = [
+            path(
+                "app{}/<locator>/<action>/<error>".format(i),
+                View.as_view(),
+                name="app{}".format(i),
+            )
+            for i in range(2000)
+        ]
+        urlpatterns.append(
+            path(
+                "paid/<locator>/<action>/<error>",
+                PaidView.as_view(),
+                name="paid",
+            ),
+        )
+        urlconf = type("BenchUrlconf", (), {"urlpatterns": urlpatterns})
+        kwargs = {"locator": 0, "action": "success", "error": 0}
+
+        # Resolved on every notification
+        def legacy():
+            for _i in range(iterations):
+                resolve(reverse("paid", kwargs=kwargs)).func.view_class
+
+        # Resolved once
+        def cached():
+            for _i in range(iterations):
+                notify_target("paid").view_class
+
+        with override_settings(ROOT_URLCONF=urlconf):
+            before = self.baseline("reverse() + resolve()", iterations, legacy)
+            after = self.measure("notify_target()", iterations, cached)
+        self.compare(before, after)
+
+    def bench_money(self, iterations):
+        # Prepare random totals with 2 decimals
+        generator = random.Random(0)
+        totals = [
+            Decimal(generator.randrange(1, 10**9)).scaleb(-2)
+            for _i in range(iterations)
+        ]
+        errors = {"float": 0, "money": 0}
+
+        # Encode to cents and compare the answer using floats
+        def legacy():
+            for total in totals:
+                amount = str(int(math.ceil(float(total) * 100)))
+                if float(amount) / 100 != total:
+                    errors["float"] += 1
+
+        # Encode to minor units and compare the answer using Money
+        def money():
+            for total in totals:
+                amount = Money.from_amount(
+                    total,
+                    2,
+                    rounding=ROUND_CEILING,
+                ).encode()
+                if Money.from_minor(amount, 2) != total:
+                    errors["money"] += 1
+
+        before = self.baseline("float", iterations, legacy)
+        after = self.measure("Money", iterations, money)
+        self.compare(before, after)
+        self.debug("Mismatches: {}".format(errors), color="cyan")
+
+    def bench_payload(self, iterations):
+        # First page of every list (uses the rows in the database)
+        lists = [
+            (
+                "PaymentRequest",
+                PaymentRequest.objects.select_related("currency", "user")
+                .with_status()
+                .order_by("-request_date"),
+                ["feedback"],
+            ),
+            (
+                "PaymentAnswer",
+                PaymentAnswer.objects.select_related("payment").order_by(
+                    "-request_date",
+                ),
+                [],
+            ),
+            (
+                "PaymentConfirmation",
+                PaymentConfirmation.objects.select_related("payment").order_by(
+                    "-created",
+                ),
+                [],
+            ),
+            (
+                "PaymentReturn",
+                PaymentReturn.objects.select_related("payment").order_by(
+                    "-created",
+                ),
+                [],
+            ),
+        ]
+
+        # Bytes the database sends for a page
+        def transferred(queryset):
+            sql, params = queryset[:PAGE_SIZE].query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params)
+                rows = cursor.fetchall()
+            return sum(
+                len(str(value).encode())
+                for row in rows
+                for value in row
+                if value is not None
+            )
+
+        pages = max(iterations // PAGE_SIZE, 1)
+        for name, queryset, keep in lists:
+            deferred = queryset.without_payload(*keep)
+            self.debug(
+                "{:<30} {:>12} bytes/page -> {} bytes/page".format(
+                    name,
+                    transferred(queryset),
+                    transferred(deferred),
+                ),
+                color="cyan",
+            )
+
+            # Load the page as model instances
+            def legacy():
+                for _i in range(pages):
+                    list(queryset[:PAGE_SIZE])
+
+            def without_payload():
+                for _i in range(pages):
+                    list(deferred[:PAGE_SIZE])
+
+            before = self.baseline("{} pages".format(name), pages, legacy)
+            after = self.measure("without_payload()", pages, without_payload)
+            self.compare(before, after)
+
+    def bench_locator(self, iterations):
+        legacy_locators = []
+        new_locators = []
+
+        # Hash of the current time
+        def legacy():
+            for _i in range(iterations):
+                info_decode = str(time.time()) + str(
+                    datetime.datetime.now().microsecond,
+                )
+                legacy_locators.append(
+                    hashlib.sha3_256(info_decode.encode()).hexdigest(),
+                )
+
+        # Prefix and counter
+        generator = LocatorGenerator()
+
+        def sequence():
+            for _i in range(iterations):
+                new_locators.append(generator.next())
+
+        before = self.baseline("sha3_256(time)", iterations, legacy)
+        after = self.measure("LocatorGenerator.next", iterations, sequence)
+        self.compare(before, after)
+        self.measure(
+            "LocatorGenerator.bulk",
+            iterations,
+            lambda: generator.bulk(iterations),
+        )
+        self.debug(
+            "Collisions: sha3_256(time)={} LocatorGenerator={}".format(
+                iterations - len(set(legacy_locators)),
+                iterations - len(set(new_locators)),
+            ),
+            color="cyan",
+        )
+
+    def bench_hex36(self, iterations):
+        # Order numbers as saved (every order once) and as reconciled (the
+        # same orders seen many times)
+        generator = random.Random(0)
+        orders = list(range(1, iterations + 1))
+        repeated = [generator.randrange(1, 1000) for _i in range(iterations)]
+        errors = 0
+
+        # New encoder for every order
+        def legacy():
+            for order in orders:
+                CodenerixEncoder().numeric_encode(
+                    order,
+                    dic="hex36",
+                    length=7,
+                    cfill="A",
+                )
+
+        before = self.baseline("CodenerixEncoder", iterations, legacy)
+        hex36.encode.cache_clear()
+        after = self.measure(
+            "hex36.encode_many",
+            iterations,
+            lambda: hex36.encode_many(orders),
+        )
+        self.compare(before, after)
+        self.measure(
+            "hex36.encode_many (repeated)",
+            iterations,
+            lambda: hex36.encode_many(repeated),
+        )
+
+        # Decode them back
+        refs = hex36.encode_many(orders)
+        hex36.decode.cache_clear()
+        self.measure(
+            "hex36.decode_many",
+            iterations,
+            lambda: hex36.decode_many(refs),
+        )
+        for order, ref in zip(orders, refs):
+            if order not in hex36.candidates(ref):
+                errors += 1
+        self.debug("Errors: {}".format(errors), color="cyan")
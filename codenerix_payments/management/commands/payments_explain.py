@@ -0,0 +1,144 @@
+#
+# django-codenerix-payments
+#
+# Codenerix GNU
+#
+# Project URL : http://www.codenerix.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from codenerix_lib.debugger import Debugger
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from codenerix_payments.models import (  # type: ignore
+    PaymentAnswer,
+    PaymentConfirmation,
+    PaymentRequest,
+    PaymentReturn,
+    returned_amount,
+)
+
+
+class Command(BaseCommand, Debugger):
+    # Show this when the user types help
+    help = "Show the query plans for the payments hot queries"
+
+    def add_arguments(self, parser):
+        # Named (optional) arguments
+        parser.add_argument(
+            "--database",
+            action="store",
+            dest="database",
+            default=DEFAULT_DB_ALIAS,
+            help="Database to explain the queries on",
+        )
+
+        # Named (optional) arguments
+        parser.add_argument(
+            "--analyze",
+            action="store_true",
+            dest="analyze",
+            default=False,
+            help="Execute the queries and show real timings (PostgreSQL)",
+        )
+
+    def handle(self, *args, **options):
+        # Autoconfigure Debugger
+        self.set_name("EXPLAIN")
+        self.set_debug()
+
+        # Arguments
+        database = options["database"]
+        vendor = connections[database].vendor
+        explain_options = {}
+        if options["analyze"] and vendor == "postgresql":
+            explain_options["analyze"] = True
+
+        # Use a real payment if there is any, so the plans are realistic
+        pr = PaymentRequest.objects.using(database).order_by("-pk").first()
+        if pr is None:
+            pr = PaymentRequest(pk=0, locator="", ref="", order_ref="")
+            pr.platform = ""
+
+        # Hot queries
+        queries = [
+            (
+                "Payment by locator",
+                PaymentRequest.objects.filter(locator=pr.locator),
+            ),
+            (
+                "Payment by order reference",
+                PaymentRequest.objects.filter(order_ref=pr.order_ref),
+            ),
+            (
+                "Payment by remote reference",
+                PaymentRequest.objects.filter(ref=pr.ref),
+            ),
+            (
+                "Payments list",
+                PaymentRequest.objects.with_status().order_by(
+                    "-request_date",
+                )[:50],
+            ),
+            (
+                "Payments by platform",
+                PaymentRequest.objects.filter(platform=pr.platform).order_by(
+                    "-request_date",
+                )[:50],
+            ),
+            (
+                "Cancelled payments",
+                PaymentRequest.objects.filter(cancelled=True).order_by(
+                    "-request_date",
+                )[:50],
+            ),
+            (
+                "Successful answer",
+                PaymentAnswer.objects.filter(
+                    payment=pr.pk,
+                    ref__isnull=False,
+                    error=False,
+                ),
+            ),
+            (
+                "Last confirmation",
+                PaymentConfirmation.objects.filter(
+                    payment=pr.pk,
+                    ref__isnull=False,
+                ).order_by("-created")[:1],
+            ),
+            (
+                "Total returned",
+                PaymentReturn.objects.filter(
+                    payment=pr.pk,
+                    return_order_ref__isnull=False,
+                    error=False,
+                )
+                .order_by()
+                .values("payment")
+                .annotate(returned=returned_amount()),
+            ),
+        ]
+
+        # Show plans
+        self.debug(
+            "Database: {} ({})".format(database, vendor),
+            color="blue",
+        )
+        for name, queryset in queries:
+            self.debug(name, color="cyan")
+            self.debug(
+                queryset.using(database).explain(**explain_options),
+                color="white",
+            )
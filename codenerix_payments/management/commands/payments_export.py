@@ -0,0 +1,166 @@
+#
+# django-codenerix-payments
+#
+# Codenerix GNU
+#
+# Project URL : http://www.codenerix.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+
+from codenerix_lib.debugger import Debugger
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from codenerix_payments.exports import (  # type: ignore
+    EXPORT_CHUNK,
+    EXPORT_COLUMNS,
+    EXPORT_DEFAULT_COLUMNS,
+    EXPORT_FORMATS,
+    export,
+    parse_when,
+)
+
+
+class Command(BaseCommand, Debugger):
+    # Show this when the user types help
+    help = "Export the payment requests with their answers and returns"
+
+    def add_arguments(self, parser):
+        # Named (optional) arguments
+        parser.add_argument(
+            "--format",
+            action="store",
+            dest="format",
+            default="csv",
+            choices=EXPORT_FORMATS,
+            help="Output format",
+        )
+
+        # Named (optional) arguments
+        parser.add_argument(
+            "--columns",
+            action="store",
+            dest="columns",
+            default=",".join(EXPORT_DEFAULT_COLUMNS),
+            help="Columns separated by commas: {}".format(
+                ", ".join(EXPORT_COLUMNS),
+            ),
+        )
+
+        # Named (optional) arguments
+        parser.add_argument(
+            "--since",
+            action="store",
+            dest="since",
+            default=None,
+            help="First request date to export (included)",
+        )
+
+        # Named (optional) arguments
+        parser.add_argument(
+            "--until",
+            action="store",
+            dest="until",
+            default=None,
+            help="Last request date to export (excluded)",
+        )
+
+        # Named (optional) arguments
+        parser.add_argument(
+            "--cursor",
+            action="store",
+            dest="cursor",
+            default=None,
+            help="Continue after the row with this cursor",
+        )
+
+        # Named (optional) arguments
+        parser.add_argument(
+            "--output",
+            action="store",
+            dest="output",
+            default="-",
+            help="File to write, '-' to write to the standard output",
+        )
+
+        # Named (optional) arguments
+        parser.add_argument(
+            "--chunk",
+            action="store",
+            dest="chunk",
+            type=int,
+            default=EXPORT_CHUNK,
+            help="Payment requests read from the database at once",
+        )
+
+        # Named (optional) arguments
+        parser.add_argument(
+            "--database",
+            action="store",
+            dest="database",
+            default=DEFAULT_DB_ALIAS,
+            help="Database with the payments",
+        )
+
+    def handle(self, *args, **options):
+        # Autoconfigure Debugger (out of the way of the export)
+        self.set_name("EXPORT")
+        if options["output"] == "-":
+            self.set_debug({"screen": (sys.stderr, ["*"])})
+        else:
+            self.set_debug()
+
+        # Arguments
+        columns = [
+            column.strip()
+            for column in options["columns"].split(",")
+            if column.strip()
+        ]
+        try:
+            since = options["since"] and parse_when(options["since"])
+            until = options["until"] and parse_when(options["until"])
+            chunks = export(
+                options["format"],
+                columns=columns,
+                chunk_size=max(options["chunk"], 1),
+                since=since,
+                until=until,
+                cursor=options["cursor"],
+                using=options["database"],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        # Write
+        if options["output"] == "-":
+            target = sys.stdout
+        else:
+            try:
+                target = open(
+                    options["output"],
+                    "w",
+                    newline="",
+                    encoding="utf-8",
+                )
+            except OSError as e:
+                raise CommandError(str(e))
+        try:
+            for chunk in chunks:
+                target.write(chunk)
+        finally:
+            if target is not sys.stdout:
+                target.close()
+
+        self.debug("Export finished", color="green")
@@ -0,0 +1,138 @@
+#
+# django-codenerix-payments
+#
+# Codenerix GNU
+#
+# Project URL : http://www.codenerix.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import multiprocessing
+import time
+
+from codenerix_lib.debugger import Debugger
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+
+from codenerix_payments.models import PaymentNotification  # type: ignore
+
+
+class Command(BaseCommand, Debugger):
+    # Show this when the user types help
+    help = "Deliver the notifications waiting in the outbox"
+
+    def add_arguments(self, parser):
+        # Named (optional) arguments
+        parser.add_argument(
+            "--processes",
+            action="store",
+            dest="processes",
+            type=int,
+            default=1,
+            help="Number of worker processes",
+        )
+
+        # Named (optional) arguments
+        parser.add_argument(
+            "--batch",
+            action="store",
+            dest="batch",
+            type=int,
+            default=50,
+            help="Notifications claimed by a worker at once",
+        )
+
+        # Named (optional) arguments
+        parser.add_argument(
+            "--sleep",
+            action="store",
+            dest="sleep",
+            type=float,
+            default=5,
+            help="Seconds to wait when there is nothing to deliver",
+        )
+
+        # Named (optional) arguments
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            dest="once",
+            default=False,
+            help="Exit when there is nothing left to deliver",
+        )
+
+        # Named (optional) arguments
+        parser.add_argument(
+            "--requeue",
+            action="store_true",
+            dest="requeue",
+            default=False,
+            help="Queue again the dead notifications before starting",
+        )
+
+    def handle(self, *args, **options):
+        # Autoconfigure Debugger
+        self.set_name("NOTIFY")
+        self.set_debug()
+
+        # Give dead notifications another chance
+        if options["requeue"]:
+            requeued = PaymentNotification.objects.filter(
+                status="dead",
+            ).update(status="pending", attempts=0, next_attempt=timezone.now())
+            self.debug(
+                "Requeued {} dead notifications".format(requeued),
+                color="yellow",
+            )
+
+        # Start workers
+        processes = max(options["processes"], 1)
+        args = (options["batch"], options["sleep"], options["once"])
+        if processes == 1:
+            self.work(*args)
+        else:
+            # Connections can not be shared with the children
+            connections.close_all()
+            workers = [
+                multiprocessing.Process(target=self.work, args=args)
+                for _i in range(processes)
+            ]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+
+    def work(self, batch, sleep, once):
+        while True:
+            # Claim notifications
+            notifications = list(PaymentNotification.objects.claim(batch))
+
+            # Deliver them
+            for notification in notifications:
+                if notification.deliver():
+                    self.debug(
+                        "Delivered {}".format(notification),
+                        color="green",
+                    )
+                else:
+                    self.debug(
+                        "Failed {}".format(notification),
+                        color="red",
+                    )
+
+            # Wait for more
+            if not notifications:
+                if once:
+                    break
+                time.sleep(sleep)
@@ -0,0 +1,180 @@
+#
+# django-codenerix-payments
+#
+# Codenerix GNU
+#
+# Project URL : http://www.codenerix.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+
+from codenerix_lib.debugger import Debugger
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from codenerix_payments.reconciliation import (  # type: ignore
+    MISMATCHES,
+    RECONCILE_BATCH,
+    SETTLEMENT_COLUMNS,
+    Reconciler,
+    read_settlement,
+    write_report,
+)
+
+
+class Command(BaseCommand, Debugger):
+    # Show this when the user types help
+    help = (
+        "Reconcile a settlement file (CSV) with the payments and write the "
+        "mismatches found as CSV"
+    )
+
+    def add_arguments(self, parser):
+        # Positional arguments
+        parser.add_argument(
+            "settlement",
+            help="Settlement file, '-' to read it from the standard input",
+        )
+
+        # Named (optional) arguments
+        parser.add_argument(
+            "--kind",
+            action="store",
+            dest="kind",
+            required=True,
+            choices=sorted(SETTLEMENT_COLUMNS),
+            help="Kind of settlement file",
+        )
+
+        # Named (optional) arguments
+        parser.add_argument(
+            "--platform",
+            action="store",
+            dest="platform",
+            default=None,
+            help="Only reconcile payments of this platform",
+        )
+
+        # Named (optional) arguments
+        parser.add_argument(
+            "--output",
+            action="store",
+            dest="output",
+            default="-",
+            help="Mismatch report, '-' to write it to the standard output",
+        )
+
+        # Named (optional) arguments
+        parser.add_argument(
+            "--delimiter",
+            action="store",
+            dest="delimiter",
+            default=",",
+            help="Column delimiter of the settlement file and the report",
+        )
+
+        # Named (optional) arguments
+        parser.add_argument(
+            "--encoding",
+            action="store",
+            dest="encoding",
+            default="utf-8",
+            help="Encoding of the settlement file",
+        )
+
+        # Named (optional) arguments
+        parser.add_argument(
+            "--batch",
+            action="store",
+            dest="batch",
+            type=int,
+            default=RECONCILE_BATCH,
+            help="Settlement lines looked up in the database at once",
+        )
+
+        # Named (optional) arguments
+        parser.add_argument(
+            "--database",
+            action="store",
+            dest="database",
+            default=DEFAULT_DB_ALIAS,
+            help="Database with the payments",
+        )
+
+    def handle(self, *args, **options):
+        # Autoconfigure Debugger (out of the way of the report)
+        self.set_name("RECONCILE")
+        if options["output"] == "-":
+            self.set_debug({"screen": (sys.stderr, ["*"])})
+        else:
+            self.set_debug()
+
+        # Open files
+        try:
+            if options["settlement"] == "-":
+                source = sys.stdin
+            else:
+                source = open(
+                    options["settlement"],
+                    newline="",
+                    encoding=options["encoding"],
+                )
+            if options["output"] == "-":
+                target = self.stdout
+            else:
+                target = open(
+                    options["output"],
+                    "w",
+                    newline="",
+                    encoding="utf-8",
+                )
+        except OSError as e:
+            raise CommandError(str(e))
+
+        # Reconcile
+        reconciler = Reconciler(
+            options["kind"],
+            platform=options["platform"],
+            batch=max(options["batch"], 1),
+            using=options["database"],
+        )
+        try:
+            lines = read_settlement(
+                source,
+                options["kind"],
+                delimiter=options["delimiter"],
+            )
+            write_report(
+                target,
+                reconciler.run(lines),
+                delimiter=options["delimiter"],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        finally:
+            if source is not sys.stdin:
+                source.close()
+            if target is not self.stdout:
+                target.close()
+
+        # Summary
+        self.debug(
+            "Lines reconciled: {}".format(reconciler.lines),
+            color="blue",
+        )
+        for kind in MISMATCHES:
+            self.debug(
+                "{:<15} {:>10}".format(kind, reconciler.counts[kind]),
+                color="red" if reconciler.counts[kind] else "green",
+            )
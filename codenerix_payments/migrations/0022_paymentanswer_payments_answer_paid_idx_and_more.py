@@ -0,0 +1,74 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("codenerix_payments", "0021_paymentreturn_amount"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="paymentanswer",
+            index=models.Index(
+                condition=models.Q(("error", False), ("ref__isnull", False)),
+                fields=["payment"],
+                name="payments_answer_paid_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="paymentconfirmation",
+            index=models.Index(
+                condition=models.Q(("ref__isnull", False)),
+                fields=["payment", "-created"],
+                name="payments_confirmation_ref_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="paymentrequest",
+            index=models.Index(
+                fields=["request_date"], name="payments_request_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="paymentrequest",
+            index=models.Index(
+                fields=["order_ref"], name="payments_request_order_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="paymentrequest",
+            index=models.Index(
+                fields=["ref"], name="payments_request_ref_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="paymentrequest",
+            index=models.Index(
+                fields=["platform", "request_date"],
+                name="payments_request_platform_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="paymentrequest",
+            index=models.Index(
+                condition=models.Q(("cancelled", True)),
+                fields=["request_date"],
+                name="payments_request_cancel_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="paymentreturn",
+            index=models.Index(
+                condition=models.Q(
+                    ("error", False), ("return_order_ref__isnull", False)
+                ),
+                fields=["payment"],
+                name="payments_return_accepted_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,123 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:25
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        (
+            "codenerix_payments",
+            "0022_paymentanswer_payments_answer_paid_idx_and_more",
+        ),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PaymentNotification",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Created"
+                    ),
+                ),
+                (
+                    "updated",
+                    models.DateTimeField(
+                        auto_now=True, verbose_name="Updated"
+                    ),
+                ),
+                (
+                    "answer",
+                    models.JSONField(
+                        blank=True, null=True, verbose_name="Answer"
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("done", "Done"),
+                            ("dead", "Dead"),
+                        ],
+                        default="pending",
+                        max_length=7,
+                        verbose_name="Status",
+                    ),
+                ),
+                (
+                    "attempts",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Attempts"
+                    ),
+                ),
+                (
+                    "next_attempt",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        verbose_name="Next attempt",
+                    ),
+                ),
+                (
+                    "delivered",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Delivered"
+                    ),
+                ),
+                (
+                    "error_txt",
+                    models.TextField(
+                        blank=True, null=True, verbose_name="Error Text"
+                    ),
+                ),
+                (
+                    "ip",
+                    models.GenericIPAddressField(
+                        blank=True,
+                        editable=False,
+                        null=True,
+                        verbose_name="IP",
+                    ),
+                ),
+                (
+                    "payment",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="paymentnotifications",
+                        to="codenerix_payments.paymentrequest",
+                    ),
+                ),
+            ],
+            options={
+                "abstract": False,
+                "default_permissions": (
+                    "add",
+                    "change",
+                    "delete",
+                    "view",
+                    "list",
+                    "detail",
+                ),
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("status", "pending")),
+                        fields=["next_attempt"],
+                        name="payments_notification_due_idx",
+                    )
+                ],
+            },
+        ),
+    ]
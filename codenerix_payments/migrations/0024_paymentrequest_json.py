@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:34
+
+import json
+
+from django.db import migrations, models
+
+FIELDS = ["request", "answer"]
+
+
+def to_json(value):
+    # Empty values were never decoded, text that is not JSON is kept as a
+    # JSON string so the column can be converted
+    if not value:
+        return None
+    try:
+        json.loads(value)
+    except ValueError:
+        return json.dumps(value)
+    return value
+
+
+def from_json(value):
+    # Undo to_json(): JSON strings go back to plain text
+    if value is None:
+        return None
+    try:
+        decoded = json.loads(value)
+    except ValueError:
+        return value
+    if isinstance(decoded, str):
+        return decoded
+    return value
+
+
+def run_migrate(apps, schema_editor, convert=to_json):
+    model = apps.get_model("codenerix_payments", "PaymentRequest")
+    rows = model.objects.values_list("pk", *FIELDS).iterator()
+    for pk, *values in rows:
+        converted = [convert(value) for value in values]
+        if converted != values:
+            model.objects.filter(pk=pk).update(**dict(zip(FIELDS, converted)))
+
+
+def run_rollback(apps, schema_editor):
+    run_migrate(apps, schema_editor, convert=from_json)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("codenerix_payments", "0023_paymentnotification"),
+    ]
+
+    operations = [
+        migrations.RunPython(run_migrate, run_rollback),  # type: ignore
+        migrations.AlterField(
+            model_name="paymentrequest",
+            name="answer",
+            field=models.JSONField(
+                blank=True, null=True, verbose_name="Answer"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="paymentrequest",
+            name="request",
+            field=models.JSONField(
+                blank=True, null=True, verbose_name="Request"
+            ),
+        ),
+    ]
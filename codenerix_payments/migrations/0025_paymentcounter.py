@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("codenerix_payments", "0024_paymentrequest_json"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PaymentCounter",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Created"
+                    ),
+                ),
+                (
+                    "updated",
+                    models.DateTimeField(
+                        auto_now=True, verbose_name="Updated"
+                    ),
+                ),
+                (
+                    "name",
+                    models.CharField(
+                        max_length=30, unique=True, verbose_name="Name"
+                    ),
+                ),
+                (
+                    "value",
+                    models.PositiveBigIntegerField(
+                        default=0, verbose_name="Value"
+                    ),
+                ),
+            ],
+            options={
+                "abstract": False,
+                "default_permissions": (
+                    "add",
+                    "change",
+                    "delete",
+                    "view",
+                    "list",
+                    "detail",
+                ),
+            },
+        ),
+    ]
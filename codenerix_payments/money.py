@@ -0,0 +1,113 @@
+#
+# django-codenerix-payments
+#
+# Codenerix GNU
+#
+# Project URL : http://www.codenerix.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# type: ignore
+
+from decimal import Decimal
+
+from codenerix_payments.iso4217 import iso4217
+
+# Minor unit used when the currency is not in the ISO 4217 table
+DEFAULT_EXPONENT = 2
+
+
+def currency_exponent(currency):
+    """
+    Minor unit of a Currency (or ISO 4217 code), DEFAULT_EXPONENT when the
+    currency is unknown
+    """
+    if currency is None:
+        return DEFAULT_EXPONENT
+    details = iso4217(getattr(currency, "iso4217", currency))
+    if details is None:
+        return DEFAULT_EXPONENT
+    return details.exponent
+
+
+class Money:
+    """
+    Amount stored as an integer number of minor units (cents for EUR, yen
+    for JPY,...) so protocols encode and compare amounts without floats
+
+    Money.from_amount(amount, exponent) requires the amount to be exact in
+    that minor unit unless a rounding mode (decimal.ROUND_*) is given, it
+    raises ValueError otherwise (and decimal.InvalidOperation when the
+    amount is not a number).
+    """
+
+    __slots__ = ("minor", "exponent")
+
+    def __init__(self, minor, exponent=DEFAULT_EXPONENT):
+        self.minor = minor
+        self.exponent = exponent
+
+    @classmethod
+    def from_minor(cls, minor, exponent=DEFAULT_EXPONENT):
+        # Protocols send minor units as integers or strings of digits
+        return cls(int(minor), exponent)
+
+    @classmethod
+    def from_amount(cls, amount, exponent=DEFAULT_EXPONENT, rounding=None):
+        # Floats go through str() so 12.1 is 12.1 and not 12.0999...
+        if not isinstance(amount, Decimal):
+            amount = Decimal(str(amount).strip())
+        scaled = amount.scaleb(exponent)
+        if rounding is None:
+            minor = scaled.to_integral_value()
+            if minor != scaled:
+                raise ValueError(
+                    "Amount {} has more than {} decimals".format(
+                        amount,
+                        exponent,
+                    ),
+                )
+        else:
+            minor = scaled.to_integral_value(rounding=rounding)
+        return cls(int(minor), exponent)
+
+    @property
+    def amount(self):
+        return Decimal(self.minor).scaleb(-self.exponent)
+
+    def encode(self):
+        # Amount in minor units as protocols expect it ("1200" for 12 EUR)
+        return str(self.minor)
+
+    def __str__(self):
+        # Amount with exactly exponent decimals ("12.00" for 12 EUR)
+        return "{:.{}f}".format(self.amount, self.exponent)
+
+    def __repr__(self):
+        return "Money({}, {})".format(self.minor, self.exponent)
+
+    def __eq__(self, other):
+        if isinstance(other, Money):
+            if self.exponent == other.exponent:
+                return self.minor == other.minor
+            return self.amount == other.amount
+        elif isinstance(other, (Decimal, int)):
+            return self.amount == other
+        elif isinstance(other, (float, str)):
+            try:
+                return self.amount == Decimal(str(other).strip())
+            except ArithmeticError:
+                return False
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.amount)
@@ -0,0 +1,168 @@
+#
+# django-codenerix-payments
+#
+# Codenerix GNU
+#
+# Project URL : http://www.codenerix.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# type: ignore
+
+import os
+import threading
+
+from django.apps import apps
+from django.conf import settings
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import F, Max
+from django.utils.connection import ConnectionDoesNotExist
+
+# Order numbers a process takes from the counter at once
+ORDER_BLOCK = getattr(settings, "CDNX_PAYMENTS_ORDER_BLOCK", 100)
+
+# Counters and the field whose numbers they continue when they are created
+COUNTERS = {
+    "paymentrequest": ("PaymentRequest", "order"),
+    "paymentreturn": ("PaymentReturn", "return_order"),
+}
+
+
+class OrderAllocator:
+    """
+    Order numbers taken in blocks of ORDER_BLOCK from PaymentCounter, so a
+    process only writes the counter once per block and every order
+    reference is known before the row is inserted
+
+    Blocks are reserved on a connection of their own in autocommit mode
+    (see connection()), so the counter row is only locked while it is
+    updated and never until the transaction of the caller ends. The
+    process lock only guards the numbers already reserved, it is never
+    held while waiting for the database.
+
+    Numbers of a block that is not used up are lost when the process ends.
+    On SQLite the connection of the caller is used: inside a transaction
+    only the numbers needed are reserved, so nothing is remembered if that
+    transaction is rolled back.
+    """
+
+    def __init__(self, block=ORDER_BLOCK):
+        self.block = block
+        self.__lock = threading.Lock()
+        self.__pid = None
+        self.__blocks = {}
+
+    def next(self, name):
+        return self.bulk(name, 1)[0]
+
+    def bulk(self, name, count):
+        model = apps.get_model("codenerix_payments", "PaymentCounter")
+        using = router.db_for_write(model)
+
+        # Use what is left in the blocks
+        numbers = self.take(name, count)
+
+        # Reserve more numbers
+        missing = count - len(numbers)
+        if missing:
+            alias = self.connection(using)
+            if alias == using and connections[using].in_atomic_block:
+                reserve = missing
+            else:
+                reserve = max(missing, self.block)
+            last = self.reserve(model, alias, name, reserve)
+            first = last - reserve + 1
+            numbers += list(range(first, first + missing))
+            if reserve > missing:
+                self.give(name, first + missing, last)
+
+        return numbers
+
+    def take(self, name, count):
+        # Up to count numbers from the blocks of this process
+        with self.__lock:
+            # Blocks are not shared with forked processes
+            if self.__pid != os.getpid():
+                self.__pid = os.getpid()
+                self.__blocks = {}
+
+            numbers = []
+            blocks = self.__blocks.setdefault(name, [])
+            while blocks and len(numbers) < count:
+                first, last = blocks.pop(0)
+                taken = min(count - len(numbers), last - first + 1)
+                numbers += list(range(first, first + taken))
+                if first + taken <= last:
+                    blocks.insert(0, (first + taken, last))
+            return numbers
+
+    def give(self, name, first, last):
+        # Keep the rest of a block for the next calls
+        with self.__lock:
+            if self.__pid == os.getpid():
+                self.__blocks.setdefault(name, []).append((first, last))
+
+    def connection(self, using):
+        """
+        Alias of the connection used to reserve blocks: a connection of
+        this thread in autocommit mode, registered as "<using>-orders", or
+        using itself on SQLite (a single writer is allowed, a second
+        connection would wait for the transaction of the caller)
+        """
+        if connections[using].vendor == "sqlite":
+            return using
+
+        alias = "{}-orders".format(using)
+        try:
+            connection = connections[alias]
+        except ConnectionDoesNotExist:
+            connection = None
+
+        # Connections are not shared with forked processes, the one of the
+        # parent is forgotten without closing it (it is still in use there)
+        if getattr(connection, "orders_pid", None) != os.getpid():
+            connection = connections.create_connection(using)
+            connection.alias = alias
+            connection.orders_pid = os.getpid()
+            connections[alias] = connection
+
+        connection.close_if_unusable_or_obsolete()
+        return alias
+
+    def reserve(self, model, using, name, count):
+        # Move the counter and return the last number reserved
+        with transaction.atomic(using=using):
+            counters = model.objects.using(using).filter(name=name)
+            if not counters.update(value=F("value") + count):
+                self.create(model, using, name)
+                counters.update(value=F("value") + count)
+            return counters.values_list("value", flat=True).get()
+
+    def create(self, model, using, name):
+        # Continue after the highest number already used
+        source, field = COUNTERS[name]
+        initial = (
+            apps.get_model("codenerix_payments", source)
+            .objects.using(using)
+            .aggregate(last=Max(field))["last"]
+        )
+        try:
+            with transaction.atomic(using=using):
+                model.objects.using(using).create(
+                    name=name, value=initial or 0
+                )
+        except IntegrityError:
+            # Created by another process meanwhile
+            pass
+
+
+orders = OrderAllocator()
@@ -0,0 +1,301 @@
+#
+# django-codenerix-payments
+#
+# Codenerix GNU
+#
+# Project URL : http://www.codenerix.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# type: ignore
+
+import collections
+import csv
+import itertools
+from decimal import ROUND_CEILING, InvalidOperation
+
+from django.apps import apps
+from django.conf import settings
+from django.db.models import OuterRef, Subquery
+
+from codenerix_payments import hex36
+from codenerix_payments.currencies import currencies
+from codenerix_payments.iso4217 import iso4217
+from codenerix_payments.money import Money, currency_exponent
+
+# Columns of the settlement files for each protocol: order reference,
+# amount, currency (ISO 4217 alphabetic or numeric code, None when the
+# file has none) and authorisation code, "minor" tells if amounts come in
+# minor units ("1200" for 12 EUR)
+SETTLEMENT_COLUMNS = getattr(
+    settings,
+    "CDNX_PAYMENTS_SETTLEMENT_COLUMNS",
+    {
+        "redsys": {
+            "order": "Ds_Order",
+            "amount": "Ds_Amount",
+            "currency": "Ds_Currency",
+            "authorisation": "Ds_AuthorisationCode",
+            "minor": True,
+        },
+        "yeepay": {
+            "order": "orderId",
+            "amount": "orderAmount",
+            "currency": None,
+            "authorisation": "uniqueOrderNo",
+            "minor": False,
+        },
+    },
+)
+
+# Protocols of the payment requests settled in each kind of file
+SETTLEMENT_PROTOCOLS = {
+    "redsys": ["redsys", "redsysxml"],
+    "yeepay": ["yeepay"],
+}
+
+# Settlement lines looked up in the database at once
+RECONCILE_BATCH = getattr(settings, "CDNX_PAYMENTS_RECONCILE_BATCH", 500)
+
+# Kinds of mismatch
+MISMATCH_INVALID = "invalid"
+MISMATCH_MISSING = "missing"
+MISMATCH_UNPAID = "unpaid"
+MISMATCH_AMOUNT = "amount"
+MISMATCH_CURRENCY = "currency"
+MISMATCH_AUTHORISATION = "authorisation"
+MISMATCHES = [
+    MISMATCH_INVALID,
+    MISMATCH_MISSING,
+    MISMATCH_UNPAID,
+    MISMATCH_AMOUNT,
+    MISMATCH_CURRENCY,
+    MISMATCH_AUTHORISATION,
+]
+
+SettlementLine = collections.namedtuple(
+    "SettlementLine",
+    ["line", "order_ref", "amount", "currency", "authorisation"],
+)
+
+SettledPayment = collections.namedtuple(
+    "SettledPayment",
+    ["locator", "order_ref", "total", "currency_id", "settled_ref"],
+)
+
+Mismatch = collections.namedtuple(
+    "Mismatch",
+    ["line", "order_ref", "locator", "kind", "expected", "found"],
+)
+
+
+def read_settlement(stream, kind, delimiter=","):
+    """
+    SettlementLine for every row of a settlement file (CSV with a header)
+    of the given kind (see SETTLEMENT_COLUMNS), read one row at a time
+    """
+    columns = SETTLEMENT_COLUMNS[kind]
+    reader = csv.DictReader(stream, delimiter=delimiter)
+
+    # Check the header
+    wanted = [
+        columns[field]
+        for field in ["order", "amount", "currency", "authorisation"]
+        if columns[field]
+    ]
+    missing = [column for column in wanted if column not in reader.fieldnames]
+    if missing:
+        raise ValueError(
+            "Settlement file has no column {}".format(", ".join(missing)),
+        )
+
+    for row in reader:
+        yield SettlementLine(
+            reader.line_num,
+            (row[columns["order"]] or "").strip(),
+            (row[columns["amount"]] or "").strip(),
+            (
+                (row[columns["currency"]] or "").strip()
+                if columns["currency"]
+                else None
+            ),
+            (row[columns["authorisation"]] or "").strip(),
+        )
+
+
+class Reconciler:
+    """
+    Compares settlement lines with the payment requests paid in this
+    system and yields a Mismatch for every difference
+
+    Lines are looked up RECONCILE_BATCH at a time with a single query
+    (payment requests by order_ref with the reference of their accepted
+    PaymentAnswer), nothing else is kept so any number of lines can be
+    reconciled in constant memory.
+    Totals by kind of mismatch are left in counts.
+    """
+
+    def __init__(
+        self,
+        kind,
+        platform=None,
+        batch=RECONCILE_BATCH,
+        using=None,
+    ):
+        self.kind = kind
+        self.minor = SETTLEMENT_COLUMNS[kind]["minor"]
+        self.platform = platform
+        self.batch = batch
+        self.using = using
+        self.lines = 0
+        self.counts = collections.Counter()
+
+    def run(self, lines):
+        lines = iter(lines)
+        while True:
+            chunk = list(itertools.islice(lines, self.batch))
+            if not chunk:
+                break
+            payments = self.load({line.order_ref for line in chunk})
+            for line in chunk:
+                self.lines += 1
+                mismatch = self.compare(
+                    line,
+                    payments.get(line.order_ref, []),
+                )
+                if mismatch is not None:
+                    self.counts[mismatch.kind] += 1
+                    yield mismatch
+
+    def load(self, refs):
+        # Payment requests by order reference with the reference of their
+        # last accepted answer (authorisation code or Yeepay uniqueOrderNo)
+        answers = (
+            apps.get_model("codenerix_payments", "PaymentAnswer")
+            .objects.filter(
+                payment=OuterRef("pk"),
+                ref__isnull=False,
+                error=False,
+            )
+            .order_by("-pk")
+        )
+        requests = (
+            apps.get_model("codenerix_payments", "PaymentRequest")
+            .objects.using(self.using)
+            .filter(
+                order_ref__in=refs,
+                protocol__in=SETTLEMENT_PROTOCOLS[self.kind],
+            )
+            .annotate(settled_ref=Subquery(answers.values("ref")[:1]))
+        )
+        if self.platform:
+            requests = requests.filter(platform=self.platform)
+
+        payments = {}
+        for payment in requests.values_list(*SettledPayment._fields):
+            payment = SettledPayment(*payment)
+            payments.setdefault(payment.order_ref, []).append(payment)
+        return payments
+
+    def compare(self, line, requests):
+        def mismatch(kind, expected="", found="", pr=None):
+            return Mismatch(
+                line.line,
+                line.order_ref,
+                pr.locator if pr else "",
+                kind,
+                expected,
+                found,
+            )
+
+        # Check the order reference
+        try:
+            hex36.decode(line.order_ref)
+        except ValueError:
+            return mismatch(MISMATCH_INVALID, found=line.order_ref)
+        if not requests:
+            return mismatch(MISMATCH_MISSING)
+
+        # Find the payment (references may repeat, prefer the one with the
+        # same authorisation code)
+        paid = [pr for pr in requests if pr.settled_ref is not None]
+        if not paid:
+            return mismatch(
+                MISMATCH_UNPAID,
+                found=line.authorisation,
+                pr=requests[0],
+            )
+        pr = paid[0]
+        for candidate in paid:
+            if candidate.settled_ref == line.authorisation:
+                pr = candidate
+                break
+
+        # Compare amounts
+        currency = currencies.get(pk=pr.currency_id)
+        expected = Money.from_amount(
+            pr.total,
+            currency_exponent(currency),
+            rounding=ROUND_CEILING,
+        )
+        try:
+            if self.minor:
+                amount = Money.from_minor(line.amount, expected.exponent)
+            else:
+                amount = Money.from_amount(line.amount, expected.exponent)
+        except (InvalidOperation, ValueError):
+            amount = None
+        if amount is None or amount != expected:
+            return mismatch(
+                MISMATCH_AMOUNT,
+                expected=str(expected),
+                found=str(amount) if amount is not None else line.amount,
+                pr=pr,
+            )
+
+        # Compare currencies
+        if line.currency is not None:
+            details = iso4217(line.currency)
+            same = line.currency.upper() == currency.iso4217.upper() or (
+                details is not None and details == currency.iso4217_details
+            )
+            if not same:
+                return mismatch(
+                    MISMATCH_CURRENCY,
+                    expected=currency.iso4217,
+                    found=line.currency,
+                    pr=pr,
+                )
+
+        # Compare authorisation codes
+        if pr.settled_ref != line.authorisation:
+            return mismatch(
+                MISMATCH_AUTHORISATION,
+                expected=pr.settled_ref,
+                found=line.authorisation,
+                pr=pr,
+            )
+
+        return None
+
+
+def write_report(stream, mismatches, delimiter=","):
+    """
+    Writes the mismatches as CSV one by one and returns how many
+    """
+    writer = csv.writer(stream, delimiter=delimiter)
+    writer.writerow(Mismatch._fields)
+    total = 0
+    for mismatch in mismatches:
+        writer.writerow(mismatch)
+        total += 1
+    return total
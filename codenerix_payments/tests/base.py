@@ -0,0 +1,76 @@
+#
+# django-codenerix-payments
+#
+# Codenerix GNU
+#
+# Project URL : http://www.codenerix.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# type: ignore
+
+from decimal import Decimal
+
+from codenerix.middleware import CurrentRequestMiddleware
+from django.test import TestCase, override_settings
+
+from codenerix_payments.models import Currency, PaymentRequest
+
+# Platforms used by the tests (nothing is sent to a remote system)
+PAYMENTS = {
+    "meta": {"real": False, "url": "http://testserver"},
+    "redsys": {
+        "protocol": "redsys",
+        "merchant_code": "999008881",
+        "merchant_terminal": "1",
+        "auth_key": "c2VjcmV0c2VjcmV0c2VjcmV0c2VjcmV0",
+    },
+    "paypal": {
+        "protocol": "paypal",
+        "id": "test",
+        "secret": "test",
+    },
+    "yeepay": {
+        "protocol": "yeepay",
+        "merchant_number": "10000000000",
+    },
+}
+
+
+@override_settings(
+    PAYMENTS=PAYMENTS,
+    ROOT_URLCONF="codenerix_payments.tests.urls",
+)
+class PaymentsTestCase(TestCase):
+    """
+    TestCase with the test platforms configured and helpers to create
+    currencies and payment requests
+    """
+
+    def setUp(self):
+        # Forget the request of the previous test, new payment requests
+        # take their user from it
+        CurrentRequestMiddleware().process_request(None)
+
+    def currency(self, iso4217="EUR", name="Euro", symbol="E"):
+        return Currency.objects.get_or_create(
+            iso4217=iso4217,
+            defaults={"name": name, "symbol": symbol, "price": Decimal(1)},
+        )[0]
+
+    def payment(self, total="10.00", platform="redsys", **kwargs):
+        if "currency" not in kwargs:
+            kwargs["currency"] = self.currency()
+        kwargs.setdefault("ip", "127.0.0.1")
+        pr = PaymentRequest(platform=platform, total=Decimal(total), **kwargs)
+        pr.save()
+        return pr
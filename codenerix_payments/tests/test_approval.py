@@ -0,0 +1,88 @@
+#
+# django-codenerix-payments
+#
+# Codenerix GNU
+#
+# Project URL : http://www.codenerix.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# type: ignore
+
+from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import override_settings
+
+from codenerix_payments.models import PaymentRequest
+from codenerix_payments.tests.base import PAYMENTS, PaymentsTestCase
+
+build = PaymentRequest._PaymentRequest__get_approval_redsys
+
+
+@mock.patch("codenerix_payments.models.PAYMENTS_APPROVAL_CACHE_TTL", 60)
+@mock.patch.object(
+    PaymentRequest,
+    "_PaymentRequest__get_approval_redsys",
+    autospec=True,
+    side_effect=build,
+)
+class ApprovalCacheTests(PaymentsTestCase):
+    """
+    Redsys approvals are built once and built again only when something
+    they depend on changes
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.pr = self.payment("10.00", reverse="reverse")
+
+    def approval(self):
+        return self.pr.get_approval()
+
+    def test_reused(self, build):
+        approval = self.approval()
+        self.assertIs(self.approval(), approval)
+        # Other instances find it in Django's cache
+        self.pr = PaymentRequest.objects.get(pk=self.pr.pk)
+        self.assertEqual(self.approval(), approval)
+        self.assertEqual(build.call_count, 1)
+
+    def test_total(self, build):
+        approval = self.approval()
+        self.pr.total = Decimal("20.00")
+        self.assertNotEqual(self.approval(), approval)
+        self.assertEqual(build.call_count, 2)
+
+    def test_currency(self, build):
+        approval = self.approval()
+        self.pr.currency = self.currency("USD", "Dollar", "$")
+        self.assertNotEqual(self.approval(), approval)
+        self.assertEqual(build.call_count, 2)
+
+    def test_reverse(self, build):
+        self.approval()
+        self.pr.reverse = "autorender"
+        self.approval()
+        self.assertEqual(build.call_count, 2)
+
+    def test_config(self, build):
+        approval = self.approval()
+        redsys = dict(PAYMENTS["redsys"], merchant_code="999008882")
+        with override_settings(PAYMENTS=dict(PAYMENTS, redsys=redsys)):
+            self.assertNotEqual(self.approval(), approval)
+        self.assertEqual(build.call_count, 2)
+        # Back to the old configuration
+        self.approval()
+        self.assertEqual(build.call_count, 3)
@@ -0,0 +1,72 @@
+#
+# django-codenerix-payments
+#
+# Codenerix GNU
+#
+# Project URL : http://www.codenerix.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# type: ignore
+
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from codenerix_payments.clients import PaypalApi
+
+
+class PaypalApiTests(SimpleTestCase):
+    """
+    PaypalApi sends the requests through its session and logs them like
+    paypalrestsdk.Api does
+    """
+
+    def call(self, mode):
+        api = PaypalApi(
+            {"mode": mode, "client_id": "test", "client_secret": "test"},
+            timeout=7,
+        )
+        api.session = mock.Mock()
+        api.session.request.return_value = mock.Mock(
+            status_code=201,
+            reason="Created",
+            headers={"PayPal-Debug-Id": "DEBUG-TEST"},
+            content=b'{"id": "PAYID-TEST"}',
+        )
+        with self.assertLogs("paypalrestsdk.api", "DEBUG") as logs:
+            answer = api.http_call(
+                "https://paypal.test/v1/payments/payment",
+                "POST",
+                data='{"secret": "BODY-TEST"}',
+            )
+        self.assertEqual(answer, {"id": "PAYID-TEST"})
+        self.assertEqual(api.session.request.call_args[1]["timeout"], 7)
+        return "\n".join(logs.output)
+
+    def test_sandbox(self):
+        output = self.call("sandbox")
+        self.assertIn(
+            "Request[POST]: https://paypal.test/v1/payments/payment",
+            output,
+        )
+        self.assertIn("Response[201]: Created", output)
+        self.assertIn("debug_id: DEBUG-TEST", output)
+        self.assertIn("BODY-TEST", output)
+        self.assertIn("PAYID-TEST", output)
+
+    def test_live(self):
+        output = self.call("live")
+        self.assertIn("Request[POST]", output)
+        self.assertIn("Response[201]: Created", output)
+        self.assertNotIn("BODY-TEST", output)
+        self.assertNotIn("PAYID-TEST", output)
@@ -0,0 +1,170 @@
+#
+# django-codenerix-payments
+#
+# Codenerix GNU
+#
+# Project URL : http://www.codenerix.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# type: ignore
+
+import time
+from unittest import mock
+
+import requests
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from codenerix_payments.currencies import (
+    RATES_STALE_TTL,
+    RATES_TTL,
+    CurrencyRates,
+    OfflineRatesProvider,
+    RatesProvider,
+    currencies,
+)
+from codenerix_payments.models import Currency
+from codenerix_payments.tests.base import PaymentsTestCase
+
+
+class CurrencyRegistryTests(PaymentsTestCase):
+    """
+    Currencies are remembered until they are saved or deleted
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        currencies.clear()
+        self.eur = self.currency()
+
+    def test_cached(self):
+        self.assertEqual(currencies.get(iso4217="EUR"), self.eur)
+        self.assertIs(
+            currencies.get(pk=self.eur.pk),
+            currencies.get(pk=self.eur.pk),
+        )
+        # Changes that do not send signals are not seen
+        Currency.objects.filter(pk=self.eur.pk).update(name="Changed")
+        self.assertEqual(currencies.get(iso4217="EUR").name, "Euro")
+        with self.assertNumQueries(0):
+            currencies.get(iso4217="EUR")
+            currencies.get(pk=self.eur.pk)
+
+    def test_save(self):
+        currencies.get(iso4217="EUR")
+        currencies.get(pk=self.eur.pk)
+        self.eur.name = "Euros"
+        self.eur.save()
+        self.assertEqual(currencies.get(iso4217="EUR").name, "Euros")
+        self.assertEqual(currencies.get(pk=self.eur.pk).name, "Euros")
+
+    def test_save_code(self):
+        currencies.get(iso4217="EUR")
+        # Another process remembers it under its previous code
+        currencies.clear()
+        self.eur.iso4217 = "EUX"
+        self.eur.save()
+        self.assertIsNone(currencies.get(iso4217="EUR"))
+        self.assertEqual(currencies.get(iso4217="EUX"), self.eur)
+
+    def test_delete(self):
+        pk = self.eur.pk
+        currencies.get(iso4217="EUR")
+        currencies.get(pk=pk)
+        self.eur.delete()
+        self.assertIsNone(currencies.get(iso4217="EUR"))
+        self.assertIsNone(currencies.get(pk=pk))
+
+    def test_shared_cache(self):
+        # Other processes find it in Django's cache
+        currencies.get(iso4217="EUR")
+        currencies.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(currencies.get(iso4217="EUR"), self.eur)
+
+
+class CurrencyRatesTests(SimpleTestCase):
+    """
+    Rates are fresh for RATES_TTL seconds, answered stale while they are
+    refreshed for RATES_STALE_TTL seconds more and taken from the fallback
+    when the provider fails
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.provider = mock.Mock(spec=RatesProvider)
+        self.provider.rate.return_value = 1.2
+        self.rates = CurrencyRates(
+            provider=self.provider,
+            fallback=OfflineRatesProvider({"EUR": {"USD": 1.1}}),
+        )
+
+    def cached(self, rate, age):
+        cache.set(
+            self.rates.cache_key("EUR", "USD"),
+            (rate, time.time() - age),
+        )
+
+    def test_abstract(self):
+        with self.assertRaises(TypeError):
+            RatesProvider()
+
+    def test_fresh(self):
+        self.assertEqual(self.rates.rate("EUR", "USD"), 1.2)
+        self.assertEqual(self.rates.rate("EUR", "USD"), 1.2)
+        self.provider.rate.assert_called_once_with("EUR", "USD")
+
+    def test_expired(self):
+        self.cached(1.0, RATES_TTL + RATES_STALE_TTL + 1)
+        self.assertEqual(self.rates.rate("EUR", "USD"), 1.2)
+        self.provider.rate.assert_called_once_with("EUR", "USD")
+
+    @mock.patch("codenerix_payments.currencies.threading")
+    def test_stale(self, threading):
+        self.cached(1.0, RATES_TTL + 1)
+        self.assertEqual(self.rates.rate("EUR", "USD"), 1.0)
+        self.assertEqual(self.rates.rate("EUR", "USD"), 1.0)
+        self.provider.rate.assert_not_called()
+        # Only one refresh runs in the background
+        threading.Thread.assert_called_once()
+        threading.Thread.call_args[1]["target"]()
+        self.provider.rate.assert_called_once_with("EUR", "USD")
+        self.assertEqual(self.rates.rate("EUR", "USD"), 1.2)
+        self.assertEqual(threading.Thread.call_count, 1)
+
+    @mock.patch("codenerix_payments.currencies.threading")
+    def test_stale_error(self, threading):
+        self.cached(1.0, RATES_TTL + 1)
+        self.provider.rate.side_effect = requests.ConnectionError("down")
+        self.rates.rate("EUR", "USD")
+        threading.Thread.call_args[1]["target"]()
+        # The stale rate is kept and refreshed again on the next call
+        self.assertEqual(self.rates.rate("EUR", "USD"), 1.0)
+        self.assertEqual(threading.Thread.call_count, 2)
+
+    def test_fallback(self):
+        self.provider.rate.side_effect = requests.ConnectionError("down")
+        self.assertEqual(self.rates.rate("EUR", "USD"), 1.1)
+        self.assertAlmostEqual(self.rates.rate("USD", "EUR"), 1 / 1.1)
+        self.assertEqual(self.rates.rate("USD", "USD"), 1)
+        # Fallback rates are not cached
+        self.provider.rate.side_effect = None
+        self.assertEqual(self.rates.rate("EUR", "USD"), 1.2)
+
+    @mock.patch("codenerix_payments.currencies.RATES", {})
+    def test_no_fallback(self):
+        self.provider.rate.side_effect = requests.ConnectionError("down")
+        rates = CurrencyRates(provider=self.provider)
+        with self.assertRaises(requests.ConnectionError):
+            rates.rate("EUR", "USD")
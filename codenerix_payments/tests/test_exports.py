@@ -0,0 +1,103 @@
+#
+# django-codenerix-payments
+#
+# Codenerix GNU
+#
+# Project URL : http://www.codenerix.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# type: ignore
+
+import json
+
+from django.contrib.auth.models import Permission, User
+
+from codenerix_payments.exports import export
+from codenerix_payments.models import PaymentRequest
+from codenerix_payments.tests.base import PaymentsTestCase
+
+
+class PaymentExportTests(PaymentsTestCase):
+    """
+    Users only export the payment requests they can see in the list
+    """
+
+    url = "/payments/paymentrequests/export"
+
+    def setUp(self):
+        super().setUp()
+        self.owner = User.objects.create(username="owner")
+        self.other = User.objects.create(username="other")
+        self.admin = User.objects.create(username="admin", is_superuser=True)
+        permission = Permission.objects.get(
+            content_type__app_label="codenerix_payments",
+            codename="list_paymentrequest",
+        )
+        self.owner.user_permissions.add(permission)
+        self.other.user_permissions.add(permission)
+
+        # New payment requests take their user from the current request
+        self.owned = [self.payment() for _index in range(3)]
+        self.others = [self.payment() for _index in range(2)]
+        for user, payments in [
+            (self.owner, self.owned),
+            (self.other, self.others),
+        ]:
+            PaymentRequest.objects.filter(
+                pk__in=[pr.pk for pr in payments],
+            ).update(user=user)
+
+    def exported(self, user):
+        self.client.force_login(user)
+        response = self.client.get(
+            self.url,
+            {"format": "jsonl", "columns": "locator,user"},
+        )
+        self.assertEqual(response.status_code, 200)
+        rows = [
+            json.loads(line)
+            for line in b"".join(response.streaming_content).splitlines()
+        ]
+        return {row["locator"] for row in rows}
+
+    def locators(self, payments):
+        return {pr.locator for pr in payments}
+
+    def test_own_payments(self):
+        self.assertEqual(self.exported(self.owner), self.locators(self.owned))
+        self.assertEqual(
+            self.exported(self.other),
+            self.locators(self.others),
+        )
+
+    def test_superuser(self):
+        self.assertEqual(
+            self.exported(self.admin),
+            self.locators(self.owned + self.others),
+        )
+
+    def test_permission(self):
+        user = User.objects.create(username="nobody")
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_queryset(self):
+        rows = "".join(
+            export(
+                "jsonl",
+                columns=["locator"],
+                queryset=PaymentRequest.objects.filter(user=self.other),
+            ),
+        )
+        found = {json.loads(line)["locator"] for line in rows.splitlines()}
+        self.assertEqual(found, self.locators(self.others))
@@ -0,0 +1,218 @@
+#
+# django-codenerix-payments
+#
+# Codenerix GNU
+#
+# Project URL : http://www.codenerix.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# type: ignore
+
+from unittest import mock
+
+import requests
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from codenerix_payments.gateway import (
+    LATENCY_BUCKETS,
+    Gateway,
+    GatewayBusy,
+    LatencyHistogram,
+    gateway,
+)
+from codenerix_payments.models import (
+    PaymentConfirmation,
+    PaymentError,
+    PaymentRequest,
+)
+from codenerix_payments.tests.base import PAYMENTS, PaymentsTestCase
+from codenerix_payments.tests.test_requests import remote
+
+
+def limits(**platforms):
+    # PAYMENTS with the given settings added to some platforms
+    payments = dict(PAYMENTS)
+    for platform, config in platforms.items():
+        payments[platform] = dict(payments[platform], **config)
+    return payments
+
+
+class GatewayTests(SimpleTestCase):
+    """
+    Calls are limited by platform and their latencies kept by platform,
+    operation and outcome
+    """
+
+    def setUp(self):
+        self.gateway = Gateway()
+
+    @override_settings(PAYMENTS=limits(redsys={"concurrency": 2}))
+    def test_limits_by_platform(self):
+        redsys = self.gateway.slots("redsys")
+        self.assertIs(self.gateway.slots("redsys"), redsys)
+        self.assertTrue(redsys.acquire(blocking=False))
+        self.assertTrue(redsys.acquire(blocking=False))
+        self.assertFalse(redsys.acquire(blocking=False))
+        # Other platforms have their own slots
+        paypal = self.gateway.slots("paypal")
+        self.assertIsNot(paypal, redsys)
+        self.assertTrue(paypal.acquire(blocking=False))
+
+    def test_limit_changed(self):
+        with override_settings(PAYMENTS=limits(redsys={"concurrency": 1})):
+            before = self.gateway.slots("redsys")
+            self.assertTrue(before.acquire(blocking=False))
+        with override_settings(PAYMENTS=limits(redsys={"concurrency": 2})):
+            after = self.gateway.slots("redsys")
+            self.assertIsNot(after, before)
+            self.assertIs(self.gateway.slots("redsys"), after)
+            self.assertTrue(after.acquire(blocking=False))
+            self.assertTrue(after.acquire(blocking=False))
+            self.assertFalse(after.acquire(blocking=False))
+
+    @override_settings(
+        PAYMENTS=limits(redsys={"concurrency": 1, "timeout": 0.01}),
+    )
+    def test_busy(self):
+        func = mock.Mock()
+        self.gateway.slots("redsys").acquire()
+        with self.assertRaises(GatewayBusy):
+            self.gateway.call("redsys", "redsys.test", func)
+        func.assert_not_called()
+        histogram = self.gateway.histograms()[
+            ("redsys", "redsys.test", "busy")
+        ]
+        self.assertEqual(histogram["count"], 1)
+        self.assertEqual(histogram["buckets"][LATENCY_BUCKETS[0]], 1)
+
+    @override_settings(PAYMENTS=limits(paypal={"concurrency": 1}))
+    def test_outcomes(self):
+        self.assertEqual(
+            self.gateway.call("paypal", "paypal.test", max, 1, 2),
+            2,
+        )
+        with self.assertRaises(ZeroDivisionError):
+            self.gateway.call("paypal", "paypal.test", divmod, 1, 0)
+        histograms = self.gateway.histograms()
+        self.assertEqual(
+            sorted(histograms),
+            [
+                ("paypal", "paypal.test", "error"),
+                ("paypal", "paypal.test", "ok"),
+            ],
+        )
+        for histogram in histograms.values():
+            self.assertEqual(histogram["count"], 1)
+        # Slots are released after errors too
+        self.assertTrue(self.gateway.slots("paypal").acquire(blocking=False))
+        self.gateway.reset()
+        self.assertEqual(self.gateway.histograms(), {})
+
+    def test_histogram_buckets(self):
+        histogram = LatencyHistogram()
+        for seconds in (0, 0.05, 0.07, 1, 2, 30, 31):
+            histogram.observe(seconds)
+        snapshot = histogram.snapshot()
+        self.assertEqual(snapshot["count"], 7)
+        self.assertAlmostEqual(snapshot["total"], 64.12)
+        self.assertEqual(
+            snapshot["buckets"],
+            {
+                0.05: 2,
+                0.1: 1,
+                0.25: 0,
+                0.5: 0,
+                1: 1,
+                2.5: 1,
+                5: 0,
+                10: 0,
+                30: 1,
+                float("inf"): 1,
+            },
+        )
+
+
+@mock.patch("codenerix_payments.models.yeepay_platform_client")
+class PaypalGatewayErrorTests(PaymentsTestCase):
+    """
+    PayPal confirmations store the error when PayPal can not be reached
+    """
+
+    def setUp(self):
+        super().setUp()
+        with mock.patch.object(gateway, "call", side_effect=remote):
+            self.pr = self.payment(platform="paypal")
+        self.pr = PaymentRequest.objects.get(pk=self.pr.pk)
+        self.request = RequestFactory().get("/")
+
+    def confirm(self):
+        pc = PaymentConfirmation()
+        pc.confirm(
+            self.pr,
+            {"paymentId": self.pr.ref, "PayerID": "PAYER-TEST"},
+            self.request,
+        )
+        return pc
+
+    def found(self, execute):
+        # Payment created in PayPal and waiting for its execution
+        payment = mock.Mock()
+        payment.to_dict.return_value = {
+            "state": "created",
+            "transactions": [
+                {"amount": {"total": "10.00", "currency": "EUR"}}
+            ],
+            "payer": {
+                "status": "VERIFIED",
+                "payer_info": {"payer_id": "PAYER-TEST"},
+            },
+        }
+        payment.execute.side_effect = execute
+
+        def call(platform, operation, func, *args, **kwargs):
+            if operation == "paypal.find":
+                return payment
+            return func(*args, **kwargs)
+
+        return call
+
+    @mock.patch.object(
+        gateway,
+        "call",
+        side_effect=requests.ConnectionError("paypal down"),
+    )
+    def test_find(self, call, client):
+        with self.assertRaises(PaymentError) as error:
+            self.confirm()
+        self.assertEqual(error.exception.args[0], 5)
+        pc = self.pr.paymentconfirmations.get()
+        self.assertTrue(pc.error)
+        self.assertIn("paypal down", pc.error_txt)
+        self.assertFalse(self.pr.paymentanswers.exists())
+
+    def test_execute(self, client):
+        call = self.found(GatewayBusy("paypal busy"))
+        with mock.patch.object(gateway, "call", side_effect=call):
+            pc = self.confirm()
+        self.assertFalse(pc.error)
+        pa = self.pr.paymentanswers.get()
+        self.assertTrue(pa.error)
+        self.assertEqual(pa.error_txt, '"paypal busy"')
+        self.assertIsNotNone(pa.answer_date)
+
+    def test_executed(self, client):
+        call = self.found(lambda request: {"state": "approved"})
+        with mock.patch.object(gateway, "call", side_effect=call):
+            self.confirm()
+        pa = self.pr.paymentanswers.get()
+        self.assertFalse(pa.error)
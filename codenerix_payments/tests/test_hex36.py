@@ -0,0 +1,113 @@
+#
+# django-codenerix-payments
+#
+# Codenerix GNU
+#
+# Project URL : http://www.codenerix.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# type: ignore
+
+import random
+
+from codenerix.helpers import CodenerixEncoder
+from django.test import SimpleTestCase
+
+from codenerix_payments import hex36
+
+# Random orders checked by every property (always the same ones)
+SAMPLES = 5000
+SEED = 36
+
+
+class Hex36Tests(SimpleTestCase):
+    """
+    Order references: encode() is CodenerixEncoder's hex36 and decode()
+    gives back the smallest order with the same reference
+    """
+
+    def orders(self):
+        rng = random.Random(SEED)
+        orders = list(range(2000))
+        orders += [
+            hex36.BASE**size + delta
+            for size in range(1, 9)
+            for delta in (-1, 0, 1)
+        ]
+        orders += [rng.randrange(hex36.BASE**9) for _i in range(SAMPLES)]
+        return orders
+
+    def test_encode(self):
+        encoder = CodenerixEncoder()
+        for order in self.orders():
+            self.assertEqual(
+                hex36.encode(order),
+                encoder.numeric_encode(
+                    order,
+                    "hex36",
+                    hex36.LENGTH,
+                    hex36.FILL,
+                ),
+            )
+
+    def test_candidates(self):
+        for order in self.orders():
+            ref = hex36.encode(order)
+            numbers = hex36.candidates(ref)
+            self.assertIn(order, numbers)
+            self.assertEqual(numbers, sorted(numbers))
+            for number in numbers:
+                self.assertEqual(hex36.encode(number), ref)
+
+    def test_decode(self):
+        for order in self.orders():
+            ref = hex36.encode(order)
+            self.assertEqual(hex36.decode(ref), hex36.candidates(ref)[0])
+            self.assertLessEqual(hex36.decode(ref), order)
+            self.assertEqual(hex36.encode(hex36.decode(ref)), ref)
+
+    def test_fill(self):
+        # The fill is a digit too: every number written with any amount
+        # of it
+        numbers = hex36.candidates("AAAAAAA")
+        self.assertEqual(len(numbers), hex36.LENGTH)
+        self.assertEqual(hex36.decode("AAAAAAA"), hex36.VALUES["A"])
+        self.assertEqual(hex36.decode(hex36.encode(0)), 0)
+        # "0" is not the zero digit of hex36, it is not filled
+        self.assertEqual(hex36.candidates("0000000"), [62691331276])
+        self.assertEqual(hex36.encode(62691331276), "0000000")
+
+    def test_unfilled(self):
+        # Shorter references decode to numbers encoded with the fill
+        self.assertEqual(hex36.decode("0"), hex36.VALUES["0"])
+        self.assertEqual(hex36.encode(hex36.decode("0")), "AAAAAA0")
+        self.assertEqual(hex36.decode(hex36.DIGITS[0]), 0)
+        self.assertEqual(hex36.decode("JRHY"), hex36.decode("AAAJRHY"))
+        # Longer references were not filled
+        self.assertEqual(hex36.candidates("AAAAAAAA"), [1047840822769])
+        self.assertEqual(hex36.encode(1047840822769), "AAAAAAAA")
+
+    def test_invalid(self):
+        zero = hex36.DIGITS[0]
+        for ref in ["", "a", "AAAA-AA", "AAAAAA ", zero * 2, zero + "AAAAAA"]:
+            with self.assertRaises(ValueError, msg=ref):
+                hex36.decode(ref)
+
+    def test_many(self):
+        orders = self.orders()
+        refs = hex36.encode_many(orders)
+        self.assertEqual(refs, [hex36.encode(order) for order in orders])
+        self.assertEqual(
+            hex36.decode_many(refs),
+            [hex36.decode(ref) for ref in refs],
+        )
@@ -0,0 +1,116 @@
+#
+# django-codenerix-payments
+#
+# Codenerix GNU
+#
+# Project URL : http://www.codenerix.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# type: ignore
+
+import base64
+import json
+from decimal import Decimal
+
+from django.test import SimpleTestCase
+
+from codenerix_payments import hex36
+from codenerix_payments.iso4217 import (
+    ISO4217,
+    ISO4217_CURRENCIES,
+    ISO4217_NUMERIC,
+    iso4217,
+)
+from codenerix_payments.models import PaymentError
+from codenerix_payments.money import Money, currency_exponent
+from codenerix_payments.tests.base import PaymentsTestCase
+
+
+class Iso4217TableTests(SimpleTestCase):
+    """
+    Every currency of the table by alphabetic and numeric code
+    """
+
+    def test_codes(self):
+        for alpha, numeric, exponent in ISO4217_CURRENCIES:
+            with self.subTest(alpha=alpha):
+                self.assertRegex(alpha, r"^[A-Z]{3}$")
+                self.assertRegex(numeric, r"^[0-9]{3}$")
+                self.assertIn(exponent, [0, 2, 3, 4])
+
+    def test_unique(self):
+        alphas = [alpha for alpha, _numeric, _exponent in ISO4217_CURRENCIES]
+        self.assertEqual(len(alphas), len(set(alphas)))
+        self.assertEqual(len(ISO4217), len(ISO4217_CURRENCIES))
+
+    def test_lookup(self):
+        for alpha, numeric, exponent in ISO4217_CURRENCIES:
+            with self.subTest(alpha=alpha):
+                details = iso4217(alpha)
+                self.assertEqual(details, (alpha, numeric, exponent))
+                self.assertIs(iso4217(alpha.lower()), details)
+                self.assertEqual(currency_exponent(alpha), exponent)
+
+                # Codes replaced by a new currency share the numeric code
+                by_numeric = iso4217(numeric)
+                self.assertIs(by_numeric, ISO4217_NUMERIC[numeric])
+                self.assertEqual(by_numeric.numeric, numeric)
+                self.assertEqual(by_numeric.exponent, exponent)
+
+    def test_unknown(self):
+        for code in ["", "XYZ", "000", "EU", "EURO"]:
+            with self.subTest(code=code):
+                self.assertIsNone(iso4217(code))
+        self.assertEqual(currency_exponent("XYZ"), 2)
+        self.assertEqual(currency_exponent(None), 2)
+
+    def test_minor_units(self):
+        for alpha, _numeric, exponent in ISO4217_CURRENCIES:
+            with self.subTest(alpha=alpha):
+                smallest = Decimal(1).scaleb(-exponent)
+                money = Money.from_amount(Decimal(12) + smallest, exponent)
+                self.assertEqual(money.encode(), str(12 * 10**exponent + 1))
+                self.assertEqual(money.amount, Decimal(12) + smallest)
+
+
+class RedsysCurrencyTests(PaymentsTestCase):
+    """
+    DS_MERCHANT_CURRENCY and DS_MERCHANT_AMOUNT of the Redsys approval for
+    every currency of the table
+    """
+
+    def parameters(self, pr):
+        form = pr.get_approval()["form"]
+        return json.loads(base64.b64decode(form["Ds_MerchantParameters"]))
+
+    def test_every_currency(self):
+        for index, (alpha, numeric, exponent) in enumerate(
+            ISO4217_CURRENCIES,
+        ):
+            with self.subTest(alpha=alpha):
+                symbol = hex36.encode(index)[-2:]
+                currency = self.currency(alpha, alpha, symbol)
+                pr = self.payment("12", currency=currency)
+                params = self.parameters(pr)
+                self.assertEqual(params["DS_MERCHANT_CURRENCY"], numeric)
+                self.assertEqual(
+                    params["DS_MERCHANT_AMOUNT"],
+                    str(12 * 10**exponent),
+                )
+
+    def test_unknown_currency(self):
+        currency = self.currency("XYZ", "Unknown", "?")
+        pr = self.payment("12", currency=currency)
+        with self.assertRaises(PaymentError) as raised:
+            pr.get_approval()
+        self.assertEqual(raised.exception.args[0], 1)
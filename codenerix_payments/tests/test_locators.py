@@ -0,0 +1,117 @@
+#
+# django-codenerix-payments
+#
+# Codenerix GNU
+#
+# Project URL : http://www.codenerix.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# type: ignore
+
+import multiprocessing
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.test import SimpleTestCase
+
+from codenerix_payments.locators import LocatorGenerator, locators
+from codenerix_payments.models import PaymentRequest
+from codenerix_payments.tests.base import PaymentsTestCase
+
+# Stress size: processes x threads x batches x locators per batch
+PROCESSES = 4
+THREADS = 8
+BATCHES = 100
+BATCH = 64
+
+
+def generate(batch=BATCH):
+    # Locators of a process taken by several threads at once
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        chunks = executor.map(
+            lambda _batch: locators.bulk(batch),
+            range(THREADS * BATCHES),
+        )
+        return [locator for chunk in chunks for locator in chunk]
+
+
+class LocatorTests(SimpleTestCase):
+    """
+    Locators are unique across threads and processes
+    """
+
+    def assert_unique(self, found):
+        self.assertEqual(len(found), len(set(found)))
+        for locator in found:
+            self.assertRegex(locator, r"^[0-9a-f]{64}$")
+
+    def test_next_and_bulk(self):
+        generator = LocatorGenerator()
+        found = [generator.next() for _index in range(100)]
+        found += generator.bulk(1000)
+        self.assert_unique(found)
+
+        # Same prefix and consecutive counters in a process
+        self.assertEqual(len({locator[:16] for locator in found}), 1)
+        counters = [int(locator[16:32], 16) for locator in found]
+        self.assertEqual(counters, list(range(len(found))))
+
+    def test_threads(self):
+        found = generate()
+        self.assertEqual(len(found), THREADS * BATCHES * BATCH)
+        self.assert_unique(found)
+
+    def test_processes(self):
+        if "fork" not in multiprocessing.get_all_start_methods():
+            raise unittest.SkipTest("fork is not available")
+
+        # The parent has a prefix already, children must choose their own
+        parent = locators.next()[:16]
+        context = multiprocessing.get_context("fork")
+        with context.Pool(PROCESSES) as pool:
+            results = pool.map(generate, [BATCH] * PROCESSES)
+
+        found = [locator for result in results for locator in result]
+        self.assertEqual(len(found), PROCESSES * THREADS * BATCHES * BATCH)
+        self.assert_unique(found)
+        for result in results:
+            prefixes = {locator[:16] for locator in result}
+            self.assertEqual(len(prefixes), 1)
+            self.assertNotIn(parent, prefixes)
+
+
+class LocatorRequestsTests(PaymentsTestCase):
+    """
+    Payment requests created one by one and in bulk never collide
+    """
+
+    def test_create(self):
+        currency = self.currency()
+        specs = [
+            {
+                "platform": "redsys",
+                "currency": currency,
+                "total": Decimal("1.00"),
+                "ip": "127.0.0.1",
+            }
+            for _index in range(2000)
+        ]
+        results = PaymentRequest.objects.bulk_create_requests(specs)
+        self.assertTrue(all(result.error is None for result in results))
+        for _index in range(50):
+            self.payment()
+
+        stored = PaymentRequest.objects.values_list("locator", flat=True)
+        self.assertEqual(len(stored), 2050)
+        self.assertEqual(len(set(stored)), 2050)
@@ -0,0 +1,174 @@
+#
+# django-codenerix-payments
+#
+# Codenerix GNU
+#
+# Project URL : http://www.codenerix.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# type: ignore
+
+import random
+from decimal import ROUND_CEILING, ROUND_FLOOR, Decimal
+
+from django.test import SimpleTestCase
+
+from codenerix_payments.models import PaymentError, PaymentRequest
+from codenerix_payments.money import Money
+from codenerix_payments.tests.base import PaymentsTestCase
+
+# Random amounts checked by every property (always the same ones)
+SAMPLES = 20000
+SEED = 4217
+
+# Minor units of the ISO 4217 currencies
+EXPONENTS = [0, 2, 3, 4]
+
+
+class MoneyPropertiesTests(SimpleTestCase):
+    """
+    Properties of Money over random amounts
+    """
+
+    def amounts(self, digits=15):
+        # (minor units, exponent)
+        rng = random.Random(SEED)
+        for _sample in range(SAMPLES):
+            yield (rng.randrange(10**digits), rng.choice(EXPONENTS))
+
+    def test_round_trip(self):
+        for minor, exponent in self.amounts():
+            money = Money(minor, exponent)
+            self.assertEqual(
+                Money.from_amount(money.amount, exponent).minor,
+                minor,
+            )
+            self.assertEqual(
+                Money.from_amount(str(money), exponent).minor, minor
+            )
+            self.assertEqual(
+                Money.from_minor(money.encode(), exponent).minor,
+                minor,
+            )
+
+    def test_float_round_trip(self):
+        # Floats keep 15 significant digits
+        for minor, exponent in self.amounts(digits=13):
+            money = Money(minor, exponent)
+            self.assertEqual(
+                Money.from_amount(float(money.amount), exponent), money
+            )
+            self.assertEqual(money, float(money.amount))
+
+    def test_exact_amounts(self):
+        # Amounts with more decimals than the minor unit need a rounding
+        rng = random.Random(SEED)
+        for minor, exponent in self.amounts():
+            extra = rng.randrange(1, 10)
+            amount = Decimal(minor * 10 + extra).scaleb(-exponent - 1)
+            with self.assertRaises(ValueError):
+                Money.from_amount(amount, exponent)
+
+            ceiling = Money.from_amount(amount, exponent, ROUND_CEILING)
+            floor = Money.from_amount(amount, exponent, ROUND_FLOOR)
+            self.assertEqual(ceiling.minor, minor + 1)
+            self.assertEqual(floor.minor, minor)
+            self.assertTrue(floor.amount < amount < ceiling.amount)
+
+    def test_rounding_exact_amounts(self):
+        # Rounding does not change amounts that are already exact
+        for minor, exponent in self.amounts():
+            money = Money(minor, exponent)
+            for rounding in [ROUND_CEILING, ROUND_FLOOR]:
+                self.assertEqual(
+                    Money.from_amount(money.amount, exponent, rounding),
+                    money,
+                )
+
+    def test_equality(self):
+        for minor, exponent in self.amounts():
+            money = Money(minor, exponent)
+            wider = Money(minor * 10, exponent + 1)
+            self.assertEqual(money, wider)
+            self.assertEqual(hash(money), hash(wider))
+            self.assertEqual(money, money.amount)
+            self.assertEqual(money, str(money))
+            self.assertNotEqual(money, Money(minor + 1, exponent))
+            self.assertNotEqual(money, "not a number")
+
+    def test_format(self):
+        for minor, exponent in self.amounts():
+            text = str(Money(minor, exponent))
+            if exponent:
+                units, decimals = text.split(".")
+                self.assertEqual(len(decimals), exponent)
+            else:
+                units, decimals = text, ""
+            self.assertEqual(int(units + decimals), minor)
+
+
+class ChargeAmountTests(PaymentsTestCase):
+    """
+    Totals that are not exact in the minor unit of the currency are
+    refused before storing anything
+    """
+
+    def test_exact_total(self):
+        pr = self.payment("12.34")
+        self.assertEqual(pr.charge_amount(), Money(1234, 2))
+
+    def test_inexact_total(self):
+        currency = self.currency()
+        pr = PaymentRequest(
+            platform="redsys",
+            currency=currency,
+            total=Decimal("12.345"),
+            ip="127.0.0.1",
+        )
+        with self.assertNumQueries(0):
+            with self.assertRaises(PaymentError) as raised:
+                pr.save()
+        self.assertEqual(raised.exception.args[0], 11)
+        self.assertIsNone(pr.pk)
+        self.assertFalse(PaymentRequest.objects.exists())
+
+    def test_inexact_total_zero_decimals(self):
+        currency = self.currency("JPY", "Yen", "Y")
+        pr = PaymentRequest(
+            platform="redsys",
+            currency=currency,
+            total=Decimal("1200.50"),
+            ip="127.0.0.1",
+        )
+        with self.assertRaises(PaymentError):
+            pr.save()
+        self.assertFalse(PaymentRequest.objects.exists())
+
+    def test_bulk(self):
+        currency = self.currency()
+        results = PaymentRequest.objects.bulk_create_requests(
+            [
+                {
+                    "platform": "redsys",
+                    "currency": currency,
+                    "total": Decimal(total),
+                    "ip": "127.0.0.1",
+                }
+                for total in ["1.00", "1.001", "2.00"]
+            ],
+        )
+        self.assertIsNone(results[0].error)
+        self.assertIsNone(results[1].request)
+        self.assertEqual(results[1].error.args[0], 11)
+        self.assertIsNone(results[2].error)
+        self.assertEqual(PaymentRequest.objects.count(), 2)
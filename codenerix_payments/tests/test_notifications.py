@@ -0,0 +1,274 @@
+#
+# django-codenerix-payments
+#
+# Codenerix GNU
+#
+# Project URL : http://www.codenerix.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# type: ignore
+
+import base64
+import datetime
+import json
+from unittest import mock
+
+from django.core.management import call_command
+from django.utils import timezone
+
+from codenerix_payments.models import (
+    PaymentNotification,
+    PaymentNotificationQuerySet,
+    PaymentRequest,
+)
+from codenerix_payments.security import redsys_signer
+from codenerix_payments.tests.base import PaymentsTestCase
+
+
+class RedsysNotificationTests(PaymentsTestCase):
+    """
+    Redsys notifications: the answer is stored once and the payment is
+    delivered after it is committed
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.pr = self.payment("10.00", reverse="reverse")
+        self.url = "/payments/action/{}/success/".format(self.pr.locator)
+
+    def notification(self, amount="1000", authorisation="123456"):
+        params = base64.b64encode(
+            json.dumps(
+                {
+                    "Ds_Order": self.pr.order_ref,
+                    "Ds_Amount": amount,
+                    "Ds_AuthorisationCode": authorisation,
+                },
+            ).encode(),
+        ).decode()
+        return {
+            "Ds_SignatureVersion": "HMAC_SHA256_V1",
+            "Ds_MerchantParameters": params,
+            "Ds_Signature": redsys_signer(self.pr.platform).sign(
+                self.pr.order_ref,
+                params,
+                recode=True,
+            ),
+        }
+
+    def accepted(self):
+        return self.pr.paymentanswers.filter(
+            ref__isnull=False,
+            error=False,
+        ).count()
+
+    @mock.patch.object(PaymentRequest, "deliver_notification")
+    def test_repeated_notification(self, deliver):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.client.post(self.url, self.notification()).json()
+        with self.captureOnCommitCallbacks(execute=True):
+            second = self.client.post(self.url, self.notification()).json()
+        self.assertEqual(first["result"], "OK")
+        self.assertEqual(second["error"], "PS07")
+        self.assertEqual(self.accepted(), 1)
+        self.assertEqual(deliver.call_count, 1)
+
+    @mock.patch.object(PaymentRequest, "deliver_notification")
+    def test_deliver_after_commit(self, deliver):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.post(self.url, self.notification())
+            self.assertEqual(self.accepted(), 1)
+            deliver.assert_not_called()
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        deliver.assert_called_once()
+
+    @mock.patch.object(
+        PaymentRequest,
+        "deliver_notification",
+        side_effect=RuntimeError("merchant down"),
+    )
+    def test_deliver_error_keeps_answer(self, deliver):
+        with self.assertRaises(RuntimeError):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(self.url, self.notification())
+        self.assertEqual(self.accepted(), 1)
+
+
+# CDNX_PAYMENTS_NOTIFY_OUTBOX is read when the models are imported
+@mock.patch("codenerix_payments.models.PAYMENTS_NOTIFY_OUTBOX", True)
+class OutboxTests(RedsysNotificationTests):
+    """
+    Notifications outbox: notify() stores the notification with the answer
+    and payments_notify delivers it
+    """
+
+    def queued(self, **kwargs):
+        return PaymentNotification.objects.create(payment=self.pr, **kwargs)
+
+    def past(self, seconds=1):
+        return timezone.now() - datetime.timedelta(seconds=seconds)
+
+    @mock.patch.object(PaymentRequest, "deliver_notification")
+    def test_repeated_notification(self, deliver):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            first = self.client.post(self.url, self.notification()).json()
+            second = self.client.post(self.url, self.notification()).json()
+        self.assertEqual(first["result"], "OK")
+        self.assertEqual(second["error"], "PS07")
+        self.assertEqual(callbacks, [])
+        deliver.assert_not_called()
+        notification = PaymentNotification.objects.get()
+        self.assertEqual(notification.payment, self.pr)
+        self.assertEqual(notification.answer, first)
+        self.assertEqual(notification.status, "pending")
+
+    def test_deliver_after_commit(self):
+        # Nothing is delivered by the webhook itself
+        self.test_repeated_notification()
+
+    @mock.patch.object(
+        PaymentNotification.objects,
+        "create",
+        side_effect=RuntimeError("database down"),
+    )
+    def test_deliver_error_keeps_answer(self, create):
+        # The answer is rolled back with its notification
+        with self.assertRaises(RuntimeError):
+            self.client.post(self.url, self.notification())
+        self.assertEqual(self.accepted(), 0)
+
+    def test_claim(self):
+        notification = self.queued()
+        claimed = list(PaymentNotification.objects.claim(10))
+        self.assertEqual(claimed, [notification])
+        self.assertEqual(claimed[0].attempts, 1)
+        self.assertGreater(claimed[0].next_attempt, timezone.now())
+        # A second claimer gets nothing while the lease is alive
+        self.assertEqual(list(PaymentNotification.objects.claim(10)), [])
+
+    def test_claim_lost(self):
+        notification = self.queued()
+        values_list = PaymentNotificationQuerySet.values_list
+
+        def racing(queryset, *fields):
+            candidates = list(values_list(queryset, *fields))
+            # Another worker claims them after we read the candidates
+            with mock.patch.object(
+                PaymentNotificationQuerySet,
+                "values_list",
+                values_list,
+            ):
+                PaymentNotification.objects.claim(10)
+            return candidates
+
+        with mock.patch.object(
+            PaymentNotificationQuerySet,
+            "values_list",
+            racing,
+        ):
+            self.assertEqual(list(PaymentNotification.objects.claim(10)), [])
+        notification.refresh_from_db()
+        self.assertEqual(notification.attempts, 1)
+
+    def test_claim_expired_lease(self):
+        notification = self.queued()
+        PaymentNotification.objects.claim(10)
+        PaymentNotification.objects.filter(pk=notification.pk).update(
+            next_attempt=self.past(),
+        )
+        claimed = list(PaymentNotification.objects.claim(10))
+        self.assertEqual(claimed, [notification])
+        self.assertEqual(claimed[0].attempts, 2)
+
+    def test_claim_not_due(self):
+        self.queued(next_attempt=timezone.now() + datetime.timedelta(hours=1))
+        self.queued(status="dead", next_attempt=self.past())
+        self.assertEqual(list(PaymentNotification.objects.claim(10)), [])
+
+    @mock.patch.object(
+        PaymentRequest,
+        "deliver_notification",
+        return_value=None,
+    )
+    def test_deliver(self, deliver):
+        self.queued(answer={"result": "OK"}, ip="10.0.0.1")
+        notification = PaymentNotification.objects.claim(10).get()
+        self.assertTrue(notification.deliver())
+        request = deliver.call_args[0][0]
+        self.assertEqual(request.META["REMOTE_ADDR"], "10.0.0.1")
+        self.assertEqual(deliver.call_args[1], {"answer": {"result": "OK"}})
+        notification.refresh_from_db()
+        self.assertEqual(notification.status, "done")
+        self.assertIsNotNone(notification.delivered)
+
+    @mock.patch("codenerix_payments.models.PAYMENTS_NOTIFY_MAX_DELAY", 100)
+    @mock.patch("codenerix_payments.models.PAYMENTS_NOTIFY_RETRY_DELAY", 30)
+    @mock.patch.object(
+        PaymentRequest,
+        "deliver_notification",
+        return_value="merchant down",
+    )
+    def test_backoff(self, deliver):
+        notification = self.queued()
+        for attempts, delay in [(1, 30), (2, 60), (3, 100), (4, 100)]:
+            notification.attempts = attempts
+            before = timezone.now()
+            self.assertFalse(notification.deliver())
+            notification.refresh_from_db()
+            self.assertEqual(notification.status, "pending")
+            self.assertEqual(notification.error_txt, "merchant down")
+            self.assertGreaterEqual(
+                notification.next_attempt,
+                before + datetime.timedelta(seconds=delay),
+            )
+            self.assertLess(
+                notification.next_attempt,
+                before + datetime.timedelta(seconds=delay + 5),
+            )
+
+    @mock.patch("codenerix_payments.models.PAYMENTS_NOTIFY_MAX_ATTEMPTS", 2)
+    @mock.patch.object(
+        PaymentRequest,
+        "deliver_notification",
+        return_value="merchant down",
+    )
+    def test_dead_letter(self, deliver):
+        self.queued(next_attempt=self.past())
+        for _attempt in range(2):
+            for notification in PaymentNotification.objects.claim(10):
+                notification.deliver()
+            PaymentNotification.objects.filter(status="pending").update(
+                next_attempt=self.past(),
+            )
+        notification = PaymentNotification.objects.get()
+        self.assertEqual(notification.status, "dead")
+        self.assertEqual(notification.attempts, 2)
+        self.assertEqual(list(PaymentNotification.objects.claim(10)), [])
+
+    @mock.patch.object(
+        PaymentRequest,
+        "deliver_notification",
+        return_value=None,
+    )
+    def test_requeue(self, deliver):
+        dead = self.queued(
+            status="dead", attempts=10, next_attempt=self.past()
+        )
+        call_command("payments_notify", "--once")
+        deliver.assert_not_called()
+        call_command("payments_notify", "--requeue", "--once")
+        deliver.assert_called_once()
+        dead.refresh_from_db()
+        self.assertEqual(dead.status, "done")
+        self.assertEqual(dead.attempts, 1)
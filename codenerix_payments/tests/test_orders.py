@@ -0,0 +1,136 @@
+#
+# django-codenerix-payments
+#
+# Codenerix GNU
+#
+# Project URL : http://www.codenerix.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# type: ignore
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.db import connections, transaction
+from django.test import TransactionTestCase
+
+from codenerix_payments.models import PaymentCounter
+from codenerix_payments.orders import OrderAllocator
+from codenerix_payments.tests.base import PaymentsTestCase
+
+
+def counter(name="paymentrequest"):
+    return PaymentCounter.objects.get(name=name).value
+
+
+class OrderBlockTests(TransactionTestCase):
+    """
+    Out of a transaction whole blocks are reserved
+    """
+
+    def test_blocks(self):
+        allocator = OrderAllocator(block=10)
+        first = allocator.next("paymentrequest")
+        self.assertEqual(counter(), first + 9)
+
+        # The rest of the block does not touch the database
+        with self.assertNumQueries(0):
+            numbers = allocator.bulk("paymentrequest", 9)
+        self.assertEqual(numbers, list(range(first + 1, first + 10)))
+
+        # A bigger request reserves what it needs
+        numbers = allocator.bulk("paymentrequest", 25)
+        self.assertEqual(numbers, list(range(first + 10, first + 35)))
+        self.assertEqual(counter(), first + 34)
+
+
+class OrderAllocatorTests(PaymentsTestCase):
+    """
+    Order numbers taken in blocks from PaymentCounter
+    """
+
+    def test_continue_existing_orders(self):
+        self.payment(order=500)
+        allocator = OrderAllocator(block=10)
+        self.assertEqual(allocator.next("paymentreturn"), 1)
+        PaymentCounter.objects.filter(name="paymentrequest").delete()
+        self.assertEqual(allocator.next("paymentrequest"), 501)
+
+    def test_atomic_block(self):
+        # SQLite reserves only what is needed inside a transaction
+        allocator = OrderAllocator(block=10)
+        with transaction.atomic():
+            first = allocator.next("paymentrequest")
+            self.assertEqual(counter(), first)
+            self.assertEqual(allocator.next("paymentrequest"), first + 1)
+
+    def test_lock_not_held_in_database(self):
+        allocator = OrderAllocator(block=10)
+        reserve = allocator.reserve
+        lock = allocator._OrderAllocator__lock
+
+        def check(*args):
+            self.assertFalse(lock.locked())
+            return reserve(*args)
+
+        with mock.patch.object(allocator, "reserve", side_effect=check):
+            allocator.bulk("paymentrequest", 25)
+            allocator.bulk("paymentrequest", 1)
+
+    def test_threads(self):
+        # Threads reserving and using blocks at once never repeat numbers
+        allocator = OrderAllocator(block=7)
+        counter = {"value": 0}
+        lock = threading.Lock()
+
+        def reserve(model, using, name, count):
+            time.sleep(0.001)
+            with lock:
+                counter["value"] += count
+                return counter["value"]
+
+        with mock.patch.object(allocator, "reserve", side_effect=reserve):
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                chunks = list(
+                    executor.map(
+                        lambda count: allocator.bulk("paymentrequest", count),
+                        [index % 5 + 1 for index in range(400)],
+                    ),
+                )
+        numbers = [number for chunk in chunks for number in chunk]
+        self.assertEqual(
+            len(numbers), sum(index % 5 + 1 for index in range(400))
+        )
+        self.assertEqual(len(numbers), len(set(numbers)))
+        self.assertTrue(set(numbers) <= set(range(1, counter["value"] + 1)))
+
+    def test_separate_connection(self):
+        allocator = OrderAllocator()
+        self.assertEqual(allocator.connection("default"), "default")
+
+        # Other databases use a connection of their own for every thread
+        self.addCleanup(connections.__delitem__, "default-orders")
+        with mock.patch.object(connections["default"], "vendor", "postgresql"):
+            alias = allocator.connection("default")
+            self.assertEqual(alias, "default-orders")
+            connection = connections[alias]
+            self.assertIsNot(connection, connections["default"])
+            self.assertEqual(allocator.connection("default"), alias)
+            self.assertIs(connections[alias], connection)
+
+            # A forked process does not use the connection of its parent
+            connection.orders_pid = -1
+            allocator.connection("default")
+            self.assertIsNot(connections[alias], connection)
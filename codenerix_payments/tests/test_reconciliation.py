@@ -0,0 +1,199 @@
+#
+# django-codenerix-payments
+#
+# Codenerix GNU
+#
+# Project URL : http://www.codenerix.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# type: ignore
+
+import io
+
+from codenerix_payments.models import PaymentAnswer
+from codenerix_payments.reconciliation import (
+    MISMATCH_AMOUNT,
+    MISMATCH_AUTHORISATION,
+    MISMATCH_CURRENCY,
+    MISMATCH_INVALID,
+    MISMATCH_MISSING,
+    MISMATCH_UNPAID,
+    Reconciler,
+    read_settlement,
+    write_report,
+)
+from codenerix_payments.tests.base import PaymentsTestCase
+
+
+class ReconcilerTests(PaymentsTestCase):
+    """
+    Every kind of mismatch between a Redsys settlement file and the
+    payments
+    """
+
+    def paid(self, total="12.00", *refs):
+        # Payment with answers, a ref of None is an answer not accepted
+        pr = self.payment(total)
+        PaymentAnswer.objects.bulk_create(
+            [
+                PaymentAnswer(
+                    payment=pr,
+                    ref=ref,
+                    error=False,
+                    ip="127.0.0.1",
+                )
+                for ref in refs
+            ],
+        )
+        return pr
+
+    def reconcile(self, *rows, batch=500):
+        settlement = io.StringIO(
+            "Ds_Order,Ds_Amount,Ds_Currency,Ds_AuthorisationCode\n"
+            + "".join("{},{},{},{}\n".format(*row) for row in rows),
+        )
+        reconciler = Reconciler("redsys", batch=batch)
+        mismatches = list(
+            reconciler.run(read_settlement(settlement, "redsys")),
+        )
+        return reconciler, mismatches
+
+    def assert_mismatch(self, row, kind, pr=None, expected="", found=""):
+        reconciler, mismatches = self.reconcile(row)
+        self.assertEqual(len(mismatches), 1)
+        mismatch = mismatches[0]
+        self.assertEqual(mismatch.kind, kind)
+        self.assertEqual(mismatch.line, 2)
+        self.assertEqual(mismatch.order_ref, row[0])
+        self.assertEqual(mismatch.locator, pr.locator if pr else "")
+        self.assertEqual(str(mismatch.expected), expected)
+        self.assertEqual(str(mismatch.found), found)
+        self.assertEqual(reconciler.counts[kind], 1)
+
+    def test_match(self):
+        pr = self.paid("12.00", "111111")
+        reconciler, mismatches = self.reconcile(
+            (pr.order_ref, "1200", "978", "111111"),
+            (pr.order_ref, "1200", "EUR", "111111"),
+        )
+        self.assertEqual(mismatches, [])
+        self.assertEqual(reconciler.lines, 2)
+
+    def test_invalid(self):
+        self.assert_mismatch(
+            ("AB-12", "1200", "978", "111111"),
+            MISMATCH_INVALID,
+            found="AB-12",
+        )
+
+    def test_missing(self):
+        self.assert_mismatch(
+            ("ZZZZZZZ", "1200", "978", "111111"),
+            MISMATCH_MISSING,
+        )
+
+    def test_unpaid(self):
+        pr = self.paid("12.00")
+        self.assert_mismatch(
+            (pr.order_ref, "1200", "978", "111111"),
+            MISMATCH_UNPAID,
+            pr=pr,
+            found="111111",
+        )
+
+    def test_unpaid_answer_without_ref(self):
+        # Answers not accepted have no reference
+        pr = self.paid("12.00", None)
+        self.assert_mismatch(
+            (pr.order_ref, "1200", "978", "111111"),
+            MISMATCH_UNPAID,
+            pr=pr,
+            found="111111",
+        )
+
+    def test_amount(self):
+        pr = self.paid("12.00", "111111")
+        self.assert_mismatch(
+            (pr.order_ref, "1201", "978", "111111"),
+            MISMATCH_AMOUNT,
+            pr=pr,
+            expected="12.00",
+            found="12.01",
+        )
+
+    def test_amount_not_a_number(self):
+        pr = self.paid("12.00", "111111")
+        self.assert_mismatch(
+            (pr.order_ref, "twelve", "978", "111111"),
+            MISMATCH_AMOUNT,
+            pr=pr,
+            expected="12.00",
+            found="twelve",
+        )
+
+    def test_currency(self):
+        pr = self.paid("12.00", "111111")
+        self.assert_mismatch(
+            (pr.order_ref, "1200", "840", "111111"),
+            MISMATCH_CURRENCY,
+            pr=pr,
+            expected="EUR",
+            found="840",
+        )
+
+    def test_authorisation(self):
+        pr = self.paid("12.00", "111111")
+        self.assert_mismatch(
+            (pr.order_ref, "1200", "978", "222222"),
+            MISMATCH_AUTHORISATION,
+            pr=pr,
+            expected="111111",
+            found="222222",
+        )
+
+    def test_last_accepted_answer(self):
+        # Answers without reference or older ones are not the settled one
+        pr = self.paid("12.00", "111111", "222222", None)
+        reconciler, mismatches = self.reconcile(
+            (pr.order_ref, "1200", "978", "222222"),
+        )
+        self.assertEqual(mismatches, [])
+
+    def test_batches(self):
+        payments = [self.paid("12.00", str(index)) for index in range(5)]
+        rows = [
+            (pr.order_ref, "1200", "978", index)
+            for index, pr in enumerate(payments)
+        ]
+        rows.append(("ZZZZZZZ", "1200", "978", "0"))
+        reconciler, mismatches = self.reconcile(*rows, batch=2)
+        self.assertEqual(reconciler.lines, 6)
+        self.assertEqual(
+            [mismatch.kind for mismatch in mismatches],
+            [MISMATCH_MISSING],
+        )
+
+    def test_report(self):
+        pr = self.paid("12.00", "111111")
+        reconciler, mismatches = self.reconcile(
+            (pr.order_ref, "1200", "978", "222222"),
+            ("ZZZZZZZ", "1200", "978", "111111"),
+        )
+        report = io.StringIO()
+        self.assertEqual(write_report(report, mismatches), 2)
+        lines = report.getvalue().splitlines()
+        self.assertEqual(
+            lines[0],
+            "line,order_ref,locator,kind,expected,found",
+        )
+        self.assertEqual(len(lines), 3)
@@ -0,0 +1,76 @@
+#
+# django-codenerix-payments
+#
+# Codenerix GNU
+#
+# Project URL : http://www.codenerix.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# type: ignore
+
+from unittest import mock
+
+from codenerix_payments import hex36
+from codenerix_payments.gateway import gateway
+from codenerix_payments.models import PaymentRequest
+from codenerix_payments.tests.base import PaymentsTestCase
+
+
+def remote(platform, operation, func, *args, **kwargs):
+    # Answers of the payment systems to the creation of a payment
+    if operation == "paypal.create":
+        func.__self__.id = "PAYID-TEST"
+        return True
+    elif operation == "yeepay.order":
+        return {"result": {"code": "00000", "uniqueOrderNo": "YEEPAY-TEST"}}
+    raise AssertionError("Unexpected call to {}".format(operation))
+
+
+@mock.patch("codenerix_payments.models.yeepay_platform_client")
+@mock.patch.object(gateway, "call", side_effect=remote)
+class CreateRequestQueriesTests(PaymentsTestCase):
+    """
+    A new payment request is inserted once with its request and, when the
+    payment system has to create it, updated once with its answer
+    """
+
+    def create(self, platform, queries):
+        currency = self.currency()
+        with self.assertNumQueries(queries):
+            pr = self.payment(platform=platform, order=1234, currency=currency)
+        return PaymentRequest.objects.get(pk=pr.pk)
+
+    def test_redsys(self, call, client):
+        pr = self.create("redsys", 1)
+        self.assertEqual(pr.order_ref, hex36.encode(1234))
+        self.assertEqual(pr.request, {})
+        self.assertIsNotNone(pr.request_date)
+        self.assertIsNotNone(pr.answer_date)
+        call.assert_not_called()
+
+    def test_paypal(self, call, client):
+        pr = self.create("paypal", 2)
+        transaction = pr.request["transactions"][0]
+        self.assertEqual(transaction["invoice_number"], pr.order_ref)
+        self.assertEqual(transaction["amount"]["total"], "10.00")
+        self.assertEqual(pr.ref, "PAYID-TEST")
+        self.assertFalse(pr.error)
+        self.assertEqual(call.call_count, 1)
+
+    def test_yeepay(self, call, client):
+        pr = self.create("yeepay", 2)
+        self.assertEqual(pr.request["orderId"], pr.order_ref)
+        self.assertEqual(pr.request["orderAmount"], "10.00")
+        self.assertEqual(pr.ref, "YEEPAY-TEST")
+        self.assertFalse(pr.error)
+        self.assertEqual(call.call_count, 1)
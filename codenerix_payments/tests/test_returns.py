@@ -0,0 +1,116 @@
+#
+# django-codenerix-payments
+#
+# Codenerix GNU
+#
+# Project URL : http://www.codenerix.com
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# type: ignore
+
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+
+from codenerix_payments.models import PaymentRequest, PaymentReturn
+from codenerix_payments.tests.base import PaymentsTestCase
+
+
+class TotalReturnedTests(PaymentsTestCase):
+    """
+    total_returned (single aggregate, with_status() annotation) against the
+    sum done in Python over the accepted returns
+    """
+
+    def refund(self, pr, amount=None, error=False):
+        refund = PaymentReturn(
+            payment=pr,
+            amount=None if amount is None else Decimal(amount),
+            error=error,
+            ip="127.0.0.1",
+        )
+        refund.save()
+        return refund
+
+    def python_total(self, pr):
+        # Returns without amount refund the whole payment
+        total = Decimal(0)
+        for refund in pr.paymentreturns.all():
+            if refund.error:
+                continue
+            if refund.amount is None:
+                total += pr.total
+            else:
+                total += refund.amount
+        return total
+
+    def assert_same_total(self, pr):
+        expected = self.python_total(pr)
+        plain = PaymentRequest.objects.get(pk=pr.pk)
+        annotated = PaymentRequest.objects.with_status().get(pk=pr.pk)
+        self.assertEqual(plain.total_returned, expected)
+        self.assertEqual(annotated.total_returned, expected)
+        self.assertEqual(annotated.returned(), plain.returned())
+
+    def test_no_returns(self):
+        pr = self.payment()
+        self.assert_same_total(pr)
+        self.assertEqual(pr.total_returned, 0)
+        self.assertEqual(pr.returned(), "N")
+
+    def test_partial_returns(self):
+        pr = self.payment("10.00")
+        self.refund(pr, "2.50")
+        self.refund(pr, "1.25")
+        self.assert_same_total(pr)
+        self.assertEqual(pr.total_returned, Decimal("3.75"))
+        self.assertEqual(pr.returned(), "P")
+
+    def test_return_without_amount(self):
+        pr = self.payment("10.00")
+        self.refund(pr)
+        self.assert_same_total(pr)
+        self.assertEqual(pr.total_returned, Decimal("10.00"))
+        self.assertEqual(pr.returned(), "A")
+
+    def test_mixed_returns(self):
+        pr = self.payment("10.00")
+        self.refund(pr, "3.00")
+        self.refund(pr)
+        self.refund(pr, "4.00", error=True)
+        self.assert_same_total(pr)
+        self.assertEqual(pr.total_returned, Decimal("13.00"))
+        self.assertEqual(pr.returned(), "E")
+
+    def test_many_payments(self):
+        payments = [self.payment(total) for total in ["1.00", "7.35", "99.99"]]
+        for index, pr in enumerate(payments):
+            for amount in [None, "0.35", "1.00"][: index + 1]:
+                self.refund(pr, amount)
+        for pr in payments:
+            self.assert_same_total(pr)
+
+    def test_clean_counts_returns_without_amount(self):
+        pr = self.payment("10.00")
+        self.refund(pr)
+        with self.assertRaises(ValidationError):
+            PaymentReturn(payment=pr, amount=Decimal("0.01")).clean()
+        with self.assertRaises(ValidationError):
+            PaymentReturn(payment=pr).clean()
+
+    def test_clean_allows_the_rest(self):
+        pr = self.payment("10.00")
+        self.refund(pr, "6.00")
+        PaymentReturn(payment=pr, amount=Decimal("4.00")).clean()
+        with self.assertRaises(ValidationError):
+            PaymentReturn(payment=pr, amount=Decimal("4.01")).clean()
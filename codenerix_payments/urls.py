@@ -33,6 +33,7 @@ from codenerix_payments.views import (
     PaymentConfirmationAutorender,
     PaymentConfirmationDetail,
     PaymentConfirmationList,
+    PaymentExport,
     PaymentPlatforms,
     PaymentRequestCreate,
     PaymentRequestCreateModal,
@@ -96,6 +97,11 @@ urlpatterns = [
         PaymentRequestCreateModal.as_view(),
         name="paymentrequest_addmodal",
     ),
+    url(
+        r"^paymentrequests/export$",
+        PaymentExport.as_view(),
+        name="paymentrequest_export",
+    ),
     url(
         r"^paymentrequests/locate/(?P<locator>[a-zA-Z0-9+/]+)$",
         PaymentRequestDetail.as_view(),
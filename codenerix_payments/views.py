@@ -32,8 +32,13 @@ from codenerix.views import (  # type: ignore
     GenUpdateModal,
 )
 from django.conf import settings
-from django.contrib.auth.decorators import login_required
-from django.http import HttpResponse, HttpResponseRedirect
+from django.contrib.auth.decorators import login_required, permission_required
+from django.http import (
+    HttpResponse,
+    HttpResponseBadRequest,
+    HttpResponseRedirect,
+    StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404, render
 from django.urls import reverse
 from django.utils.decorators import method_decorator
@@ -42,6 +47,13 @@ from django.utils.translation import gettext_lazy as _
 from django.views.decorators.csrf import csrf_exempt
 from django.views.generic import View
 
+from codenerix_payments.currencies import currencies
+from codenerix_payments.exports import (
+    EXPORT_CHUNK,
+    EXPORT_DEFAULT_COLUMNS,
+    export,
+    parse_when,
+)
 from codenerix_payments.forms import (
     CurrencyForm,
     PaymentRequestForm,
@@ -136,6 +148,18 @@ class PaymentRequestList(GenList):
             )
         return super().dispatch(*args, **kwargs)
 
+    def custom_queryset(self, queryset, info):
+        # Bring paid/returned state and related objects in the same query,
+        # the answer is only needed to render the pay button
+        keep = ["feedback"]
+        if getattr(settings, "CDNX_PAYMENTS_REQUEST_PAY", False):
+            keep.append("answer")
+        return (
+            queryset.select_related("currency", "user")
+            .with_status()
+            .without_payload(*keep)
+        )
+
 
 class PaymentRequestCreate(GenCreate):
     model = PaymentRequest
@@ -151,7 +175,7 @@ class PaymentRequestCreate(GenCreate):
         currency = form.cleaned_data.get("currency", None)
         if not currency:
             # Get the currency
-            currency = Currency.objects.filter(iso4217="EUR").first()
+            currency = currencies.get(iso4217="EUR")
             if not currency:
                 currency = Currency()
                 currency.name = "Euro"
@@ -289,6 +313,10 @@ class PaymentConfirmationList(GenList):
         "bread": [_("Payments"), _("Payment Confirmation")],
     }
 
+    def custom_queryset(self, queryset, info):
+        # Payloads are only shown in the details
+        return queryset.without_payload()
+
 
 class PaymentConfirmationDetail(GenDetail):
     model = PaymentConfirmation
@@ -315,6 +343,10 @@ class PaymentAnswerList(GenList):
         "bread": [_("Payments"), _("Payment Answers")],
     }
 
+    def custom_queryset(self, queryset, info):
+        # Payloads are only shown in the details
+        return queryset.without_payload()
+
 
 class PaymentAnswerDetail(GenDetail):
     model = PaymentAnswer
@@ -352,6 +384,10 @@ class PaymentReturnList(GenList):
         "bread": [_("Payments"), _("Payment Return")],
     }
 
+    def custom_queryset(self, queryset, info):
+        # Payloads are only shown in the details
+        return queryset.without_payload()
+
 
 class PaymentReturnDetail(GenDetail):
     model = PaymentReturn
@@ -402,6 +438,9 @@ class PaymentAction(View):
         reverse_target = "CNDX_payments_confirmation"
         # import datetime
         # with open("/tmp/codenerix_info.txt", "a") as F:
+        # Answers are stored by PaymentAnswer.success() with the payment
+        # locked and notified in the same transaction, remote calls run
+        # outside of that lock
         if True:
             # now = datetime.datetime.now()
             # F.write("\n\n{} - Start\n".format(now))
@@ -443,8 +482,7 @@ class PaymentAction(View):
                         pc = PaymentConfirmation()
                         # pc.ip = get_client_ip(self.request)
                         try:
-                            pc.confirm(pr, request.GET, request)
-                            pc.payment.notify(request)
+                            pc.confirm(pr, request.GET, request, notify=True)
                         except PaymentError as e:
                             answer["error"] = "PC{:02d}".format(e.args[0])
                             if settings.DEBUG:
@@ -479,12 +517,14 @@ class PaymentAction(View):
                         pa = PaymentAnswer()
                         # pa.ip = get_client_ip(self.request)
                         try:
-                            answer = pa.success(pr, request.POST, request)
+                            answer = pa.success(
+                                pr,
+                                request.POST,
+                                request,
+                                notify=True,
+                            )
                             # F.write("{} - PA Success\n".format(now))
                             # F.flush()
-                            pa.payment.notify(request, answer=answer)
-                            # F.write("{} - NOTIFY Success\n".format(now))
-                            # F.flush()
                         except PaymentError as e:
                             # F.write("{} - NOTIFY Error - {}\n".format(now,
                             # e))
@@ -532,25 +572,22 @@ class PaymentAction(View):
                         pa = PaymentAnswer()
                         # pa.ip = get_client_ip(self.request)
                         try:
-                            answer = pa.success(pr, request.POST, request)
+                            # Payments already answered are not notified
+                            # again
+                            answer = pa.success(
+                                pr,
+                                request.POST,
+                                request,
+                                notify=True,
+                            )
                             # F.write("{} - PA Success\n".format(now))
                             # F.flush()
 
                             # Analyze the answer
-                            notify = True
                             if answer:
                                 result = answer.get("result", None)
-                                if result == "OK":
+                                if result in ["OK", "ALREADY_OK"]:
                                     answer_plain = "SUCCESS"
-                                elif result == "ALREADY_OK":
-                                    answer_plain = "SUCCESS"
-                                    notify = False
-
-                            # Notify the payment
-                            if notify:
-                                pa.payment.notify(request, answer=answer)
-                                # F.write("{} - NOTIFY Success\n".format(now))
-                                # F.flush()
 
                         except PaymentError as e:
                             # F.write(
@@ -692,7 +729,11 @@ class PaymentConfirmationAutorender(View):
             pr = None
 
         # Check if it is already paid
-        paid = pr.paymentanswers.filter(ref__isnull=False, error=False).first()
+        paid = (
+            pr.paymentanswers.filter(ref__isnull=False, error=False)
+            .without_payload()
+            .first()
+        )
 
         # Build context
         context = {}
@@ -721,10 +762,14 @@ class PaymentReturnAutorender(View):
 
         # Check if it is already paid
         if pr:
-            refunded = pr.paymentreturns.filter(
-                return_order__isnull=False,
-                error=False,
-            ).first()
+            refunded = (
+                pr.paymentreturns.filter(
+                    return_order__isnull=False,
+                    error=False,
+                )
+                .without_payload()
+                .first()
+            )
         else:
             refunded = None
 
@@ -740,6 +785,70 @@ class PaymentReturnAutorender(View):
         return render(request, self.template_name, context)
 
 
+class PaymentExport(View):
+    """
+    Payment requests streamed as CSV, JSONL or columns (see
+    codenerix_payments.exports), GET parameters: format, columns
+    (separated by commas), since, until and cursor
+    """
+
+    content_types = {
+        "csv": "text/csv",
+        "jsonl": "application/jsonl",
+        "columns": "application/jsonl",
+    }
+
+    @method_decorator(
+        permission_required(
+            "codenerix_payments.list_paymentrequest",
+            raise_exception=True,
+        ),
+    )
+    def get(self, request, *args, **kwargs):
+        # If user is not a superuser, only export their payment requests
+        # (as PaymentRequest.__limitQ__ does in the list)
+        queryset = PaymentRequest.objects.all()
+        if not request.user.is_superuser:
+            queryset = queryset.filter(user=request.user)
+
+        # Arguments
+        output = request.GET.get("format", "csv")
+        columns = [
+            column.strip()
+            for column in request.GET.get(
+                "columns",
+                ",".join(EXPORT_DEFAULT_COLUMNS),
+            ).split(",")
+            if column.strip()
+        ]
+        try:
+            since = request.GET.get("since", None)
+            until = request.GET.get("until", None)
+            chunks = export(
+                output,
+                columns=columns,
+                chunk_size=EXPORT_CHUNK,
+                since=since and parse_when(since),
+                until=until and parse_when(until),
+                cursor=request.GET.get("cursor", None),
+                queryset=queryset,
+            )
+        except ValueError as e:
+            return HttpResponseBadRequest(str(e))
+
+        # Stream it
+        response = StreamingHttpResponse(
+            chunks,
+            content_type=self.content_types[output],
+        )
+        response["Content-Disposition"] = (
+            'attachment; filename="payments.{}"'.format(
+                "csv" if output == "csv" else "jsonl",
+            )
+        )
+        return response
+
+
 class Verifysign(View):
     template_name = "codenerix_payments/confirmation.html"
 